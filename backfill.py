@@ -0,0 +1,230 @@
+"""Загрузка истории проверки работ студентов в локальный индекс.
+
+Запуск:
+
+    python backfill.py --tenants tenants.json --index history.db
+
+Для каждого студента из реестра запрашиваются работы с from_date=0,
+а при повторном запуске - изменившиеся с прошлой загрузки. Ответ API
+разбирается по частям и записывается в базу SQLite пакетами, поэтому
+память не зависит от длины истории. Одновременно обрабатывается
+не более --workers студентов. Студент считается загруженным только
+после записи всего ответа, поэтому прерванную загрузку можно
+продолжить тем же запуском.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from cursor import CURSORS
+from engine import TENANTS_FILE
+from logs import configure_logging
+from records import Homework, HomeworkStatus
+from retry import RetryPolicy
+from streaming import stream_homeworks
+from tenants import load_tenants
+from transport import Transport
+
+
+load_dotenv()
+
+HISTORY_FILE = os.getenv('HISTORY_FILE', __file__ + '.history.db')
+WORKERS = 8
+BATCH_SIZE = 500
+HISTORY_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS homeworks (
+    chat_id TEXT NOT NULL,
+    homework_id TEXT NOT NULL,
+    date_updated INTEGER NOT NULL,
+    homework_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (chat_id, homework_id, date_updated)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS homeworks_by_date
+    ON homeworks (chat_id, date_updated);
+CREATE TABLE IF NOT EXISTS progress (
+    chat_id TEXT PRIMARY KEY,
+    resume_date INTEGER NOT NULL,
+    completed REAL NOT NULL
+);
+'''
+INSERT_HOMEWORK = ('INSERT OR IGNORE INTO homeworks (chat_id, homework_id, '
+                   'date_updated, homework_name, status) '
+                   'VALUES (?, ?, ?, ?, ?)')
+SELECT_HISTORY = ('SELECT homework_id, homework_name, status, date_updated '
+                  'FROM homeworks WHERE chat_id = ? '
+                  'ORDER BY date_updated, homework_id')
+SELECT_PROGRESS = 'SELECT resume_date FROM progress WHERE chat_id = ?'
+SAVE_PROGRESS = ('INSERT OR REPLACE INTO progress (chat_id, resume_date, '
+                 'completed) VALUES (?, ?, ?)')
+
+TENANT_LOADED = ('История студента {chat_id} загружена с {from_date}: '
+                 'записей {count}.')
+TENANT_FAILED = 'Не удалось загрузить историю студента {chat_id}: {error}'
+SUMMARY = ('Загружено студентов {done}, с ошибкой {failed}, '
+           'записей {records} за {elapsed:.1f} с.')
+
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryIndex:
+    """Индекс истории работ в базе SQLite.
+    Запись о работе хранится по ключу (чат, работа, дата изменения),
+    поэтому повторная загрузка того же ответа ничего не дублирует.
+    Для каждого студента хранится метка current_date последней
+    завершенной загрузки.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.executescript(HISTORY_SCHEMA)
+
+    def store(self, chat_id, homeworks):
+        """Запишет пакет записей о работах студента одной транзакцией."""
+        rows = [(str(chat_id), str(homework.key), homework.date_updated or 0,
+                 homework.homework_name, homework.status.value)
+                for homework in homeworks]
+        with self.lock, self.connection:
+            self.connection.executemany(INSERT_HOMEWORK, rows)
+
+    def resume_from(self, chat_id):
+        """Вернет метку завершенной загрузки студента или None."""
+        with self.lock:
+            row = self.connection.execute(
+                SELECT_PROGRESS, (str(chat_id),)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def complete(self, chat_id, current_date):
+        """Отметит загрузку истории студента завершенной."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                SAVE_PROGRESS, (str(chat_id), current_date, time.time())
+            )
+
+    def history(self, chat_id):
+        """Вернет записи о работах студента в порядке изменения."""
+        with self.lock:
+            rows = self.connection.execute(
+                SELECT_HISTORY, (str(chat_id),)
+            ).fetchall()
+        return [Homework(key, homework_name, HomeworkStatus(status),
+                         date_updated)
+                for key, homework_name, status, date_updated in rows]
+
+    def close(self):
+        """Закроет базу."""
+        with self.lock:
+            self.connection.close()
+
+
+def backfill_tenant(index, tenant, transport=None, batch_size=BATCH_SIZE,
+                    full=False):
+    """Загрузит историю работ студента в индекс index.
+    Без full продолжит с метки прошлой загрузки с запасом CURSOR_SKEW.
+    Вернет число полученных записей.
+    """
+    resume = None if full else index.resume_from(tenant.chat_id)
+    tenant.timestamp = 0 if resume is None else resume
+    from_date = CURSORS.from_date(tenant)
+    extras = {}
+    batch = []
+    count = 0
+    latest = from_date
+    for homework in stream_homeworks(
+            from_date, tenant.headers, transport, extras):
+        batch.append(homework)
+        latest = max(latest, homework.date_updated or 0)
+        if len(batch) >= batch_size:
+            index.store(tenant.chat_id, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        index.store(tenant.chat_id, batch)
+        count += len(batch)
+    index.complete(tenant.chat_id, extras.get('current_date', latest))
+    logger.info(TENANT_LOADED.format(
+        chat_id=tenant.chat_id, from_date=from_date, count=count
+    ))
+    return count
+
+
+def run_backfill(index, tenants, transport=None, workers=WORKERS,
+                 batch_size=BATCH_SIZE, full=False):
+    """Загрузит историю всех студентов tenants.
+    Одновременно обрабатывается не более workers студентов, а новые
+    задачи ставятся в пул только при освобождении места, поэтому
+    память не растет с числом студентов. Вернет сводку загрузки.
+    """
+    summary = {'done': 0, 'failed': 0, 'records': 0}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(workers)
+
+    def load(tenant):
+        try:
+            count = backfill_tenant(index, tenant, transport, batch_size, full)
+        except Exception as error:
+            logger.error(TENANT_FAILED.format(
+                chat_id=tenant.chat_id, error=error
+            ), exc_info=True)
+            with lock:
+                summary['failed'] += 1
+        else:
+            with lock:
+                summary['done'] += 1
+                summary['records'] += count
+        finally:
+            slots.release()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for tenant in tenants:
+            slots.acquire()
+            executor.submit(load, tenant)
+    summary['elapsed'] = time.monotonic() - started
+    return summary
+
+
+def parse_args(args=None):
+    """Разберет аргументы командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', default=TENANTS_FILE)
+    parser.add_argument('--index', default=HISTORY_FILE)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--full', action='store_true',
+                        help='загрузить историю заново с from_date=0')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Загрузит историю студентов и вернет код завершения."""
+    options = parse_args(args)
+    index = HistoryIndex(options.index)
+    transport = Transport(pool_size=options.workers, retry=RetryPolicy())
+    try:
+        summary = run_backfill(
+            index, load_tenants(options.tenants), transport,
+            options.workers, options.batch_size, options.full
+        )
+    finally:
+        transport.close()
+        index.close()
+    print(SUMMARY.format(**summary))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    configure_logging(__file__ + '.log')
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""Сквозной бенчмарк опроса API и отправки сообщений.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.run --tenants 1 100 10000
+
+Запросы к API Практикум.Домашка и Bot API Телеграм обслуживают
+локальные заглушки с заданной задержкой и долей ошибок. Для каждого
+числа студентов выполняется одна итерация опроса каждого из них:
+запрос, проверка и разбор ответа, отправка сообщения.
+Заглушки и каждый прогон работают в отдельных процессах, поэтому
+пиковый объем памяти прогона не зависит от предыдущих.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+from telebot import TeleBot, apihelper
+
+import homework
+from benchmarks.stubs import (PRACTICUM_PATH, TELEGRAM_PATH, PracticumStub,
+                              TelegramStub, start_process)
+from tenants import Tenant
+from transport import Transport
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+TENANTS = (1, 100, 10_000)
+WORKERS = 32
+LATENCY = 0.005
+TOLERANCE = 0.2
+BOT_TOKEN = '123456:benchmark'
+LOWER_IS_BETTER = ('p50_ms', 'p99_ms', 'peak_rss_kb')
+HIGHER_IS_BETTER = ('throughput',)
+
+RESULT_LINE = ('{tenants:>6} студентов: {throughput:9.1f} опросов/с, '
+               'p50 {p50_ms:7.2f} мс, p99 {p99_ms:7.2f} мс, '
+               'память {peak_rss_kb:9.0f} КБ, ошибок {errors}')
+REGRESSION = ('Регрессия для {tenants} студентов: {metric} = {value:.2f}, '
+              'базовое значение {baseline:.2f}.')
+BASELINE_SAVED = 'Базовые значения сохранены в {path}.'
+
+
+@contextmanager
+def stubbed(practicum_url, telegram_url):
+    """Направит запросы к API и Телеграм на локальные заглушки."""
+    endpoint, api_url = homework.ENDPOINT, apihelper.API_URL
+    homework.ENDPOINT = practicum_url + PRACTICUM_PATH
+    apihelper.API_URL = telegram_url + TELEGRAM_PATH
+    try:
+        yield
+    finally:
+        homework.ENDPOINT, apihelper.API_URL = endpoint, api_url
+
+
+def poll_once(bot, transport, tenant):
+    """Выполнит итерацию опроса для студента.
+    Вернет длительность итерации и признак ошибки.
+    """
+    started = time.perf_counter()
+    _, error = homework.poll_api(
+        tenant, partial(homework.send_message_to_chat, bot, tenant.chat_id),
+        transport
+    )
+    return time.perf_counter() - started, error is not None
+
+
+def percentile(values, share):
+    """Вернет перцентиль share отсортированного списка values."""
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+
+def run_scenario(tenants_count, practicum_url, telegram_url,
+                 workers=WORKERS):
+    """Опросит API для tenants_count студентов и вернет метрики прогона."""
+    transport = Transport(pool_size=workers)
+    try:
+        with stubbed(practicum_url, telegram_url):
+            bot = TeleBot(token=BOT_TOKEN)
+            tenants = [Tenant(f'token-{index}', str(index))
+                       for index in range(tenants_count)]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    partial(poll_once, bot, transport), tenants
+                ))
+            elapsed = time.perf_counter() - started
+    finally:
+        transport.close()
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'tenants': tenants_count,
+        'throughput': tenants_count / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'errors': sum(failed for _, failed in results),
+    }
+
+
+def run_isolated(tenants_count, workers=WORKERS, api_latency=LATENCY,
+                 api_error_rate=0, telegram_latency=LATENCY,
+                 telegram_error_rate=0):
+    """Запустит заглушки и прогон run_scenario в отдельных процессах."""
+    context = multiprocessing.get_context('spawn')
+    practicum, practicum_url = start_process(
+        PracticumStub, api_latency, api_error_rate
+    )
+    telegram, telegram_url = start_process(
+        TelegramStub, telegram_latency, telegram_error_rate
+    )
+    try:
+        with context.Pool(1, logging.disable, (logging.CRITICAL,)) as pool:
+            return pool.apply(run_scenario, (
+                tenants_count, practicum_url, telegram_url, workers
+            ), {})
+    finally:
+        practicum.terminate()
+        telegram.terminate()
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Сравнит результаты с базовыми и вернет список регрессий."""
+    regressions = []
+    for result in results:
+        base = baseline.get(str(result['tenants']))
+        if base is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            value = result[metric]
+            if metric in LOWER_IS_BETTER:
+                worse = value > base[metric] * (1 + tolerance)
+            else:
+                worse = value < base[metric] * (1 - tolerance)
+            if worse:
+                regressions.append(REGRESSION.format(
+                    tenants=result['tenants'], metric=metric,
+                    value=value, baseline=base[metric]
+                ))
+    return regressions
+
+
+def parse_args(args=None):
+    """Разберет аргументы командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, nargs='+', default=TENANTS)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--api-latency', type=float, default=LATENCY)
+    parser.add_argument('--api-error-rate', type=float, default=0)
+    parser.add_argument('--telegram-latency', type=float, default=LATENCY)
+    parser.add_argument('--telegram-error-rate', type=float, default=0)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--save', action='store_true',
+                        help='сохранить результаты как базовые')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Запустит бенчмарк и вернет код завершения."""
+    options = parse_args(args)
+    results = []
+    for tenants_count in options.tenants:
+        result = run_isolated(
+            tenants_count, options.workers, options.api_latency,
+            options.api_error_rate, options.telegram_latency,
+            options.telegram_error_rate
+        )
+        print(RESULT_LINE.format(**result))
+        results.append(result)
+    if options.save:
+        with open(options.baseline, 'w', encoding='utf-8') as file:
+            json.dump({str(result['tenants']): result for result in results},
+                      file, indent=2)
+        print(BASELINE_SAVED.format(path=options.baseline))
+        return 0
+    if not os.path.exists(options.baseline):
+        return 0
+    with open(options.baseline, encoding='utf-8') as file:
+        regressions = compare(results, json.load(file), options.tolerance)
+    for regression in regressions:
+        print(regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
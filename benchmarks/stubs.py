@@ -0,0 +1,169 @@
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import multiprocessing
+import random
+import threading
+import time
+
+
+PRACTICUM_PATH = '/api/user_api/homework_statuses/'
+TELEGRAM_PATH = '/bot{0}/{1}'
+HOMEWORK_STATUSES = ('reviewing', 'approved', 'rejected')
+PRACTICUM_ERROR = {'code': 'UnknownError', 'error': {'error': 'Сбой'}}
+TELEGRAM_ERROR = {'ok': False, 'error_code': 500,
+                  'description': 'Internal Server Error'}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов к заглушке с задержкой и долей ошибок."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def respond(self):
+        """Ответит на запрос после задержки сервера."""
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.fail():
+            status, data = HTTPStatus.INTERNAL_SERVER_ERROR, server.error_body
+        else:
+            status, data = HTTPStatus.OK, server.body(self)
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = respond
+
+    def do_HEAD(self):
+        """Ответит на запрос HEAD без тела."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        """Отключит журнал запросов к заглушке."""
+
+
+class StubServer(ThreadingHTTPServer):
+    """Локальная заглушка HTTP API.
+    Отвечает через latency секунд, доля ответов error_rate
+    завершается ошибкой сервера.
+    """
+
+    daemon_threads = True
+    error_body = None
+
+    def __init__(self, latency=0, error_rate=0, seed=0):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests_count = 0
+
+    @property
+    def url(self):
+        """Адрес сервера."""
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def fail(self):
+        """Вернет True, если на запрос нужно ответить ошибкой."""
+        with self.lock:
+            self.requests_count += 1
+            return self.random.random() < self.error_rate
+
+    def body(self, handler):
+        """Вернет данные успешного ответа."""
+        raise NotImplementedError
+
+    def start(self):
+        """Запустит сервер в фоновом потоке."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Остановит сервер."""
+        self.shutdown()
+        self.server_close()
+
+
+class PracticumStub(StubServer):
+    """Заглушка API Практикум.Домашка.
+    На каждый запрос возвращает одну работу, статус которой
+    меняется от запроса к запросу.
+    """
+
+    error_body = PRACTICUM_ERROR
+
+    def __init__(self, latency=0, error_rate=0, seed=0):
+        super().__init__(latency, error_rate, seed)
+        self.counter = itertools.count()
+
+    def body(self, handler):
+        """Вернет ответ со списком из одной работы."""
+        number = next(self.counter)
+        now = int(time.time())
+        return {
+            'homeworks': [{
+                'id': number,
+                'homework_name': f'student__homework_{number}.zip',
+                'status': HOMEWORK_STATUSES[number % len(HOMEWORK_STATUSES)],
+                'reviewer_comment': 'Комментарий ревьюера.',
+                'date_updated': time.strftime(
+                    '%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)
+                ),
+                'lesson_name': 'Итоговый проект',
+            }],
+            'current_date': now,
+        }
+
+
+class TelegramStub(StubServer):
+    """Заглушка Bot API Телеграм, принимающая метод sendMessage."""
+
+    error_body = TELEGRAM_ERROR
+
+    def __init__(self, latency=0, error_rate=0, seed=0):
+        super().__init__(latency, error_rate, seed)
+        self.counter = itertools.count(1)
+
+    def body(self, handler):
+        """Вернет ответ об успешной отправке сообщения."""
+        return {'ok': True, 'result': {
+            'message_id': next(self.counter),
+            'date': int(time.time()),
+            'chat': {'id': 1, 'type': 'private'},
+            'text': '',
+        }}
+
+
+def start_process(server_class, latency=0, error_rate=0):
+    """Запустит заглушку в отдельном процессе.
+    Так заглушка не делит GIL с измеряемым кодом.
+    Вернет процесс и адрес сервера.
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=serve, args=(server_class, latency, error_rate, sender),
+        daemon=True
+    )
+    process.start()
+    host, port = receiver.recv()
+    return process, f'http://{host}:{port}'
+
+
+def serve(server_class, latency, error_rate, connection):
+    """Создаст заглушку, сообщит ее адрес в connection и обслужит запросы."""
+    server = server_class(latency, error_rate)
+    connection.send(server.server_address)
+    server.serve_forever()
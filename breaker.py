@@ -0,0 +1,115 @@
+from enum import Enum
+import logging
+import threading
+
+from clock import SYSTEM_CLOCK
+from exceptions import CircuitOpenError
+from metrics import CIRCUIT_REJECTED, CIRCUIT_STATE
+
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 60
+HALF_OPEN_PROBES = 1
+
+CIRCUIT_OPEN = 'Предохранитель {name} открыт, вызов пропущен.'
+CIRCUIT_OPENED = ('Предохранитель {name} открыт после {failures} '
+                  'сбоев подряд на {seconds} с.')
+CIRCUIT_HALF_OPENED = 'Предохранитель {name} пропускает пробный вызов.'
+CIRCUIT_CLOSED = 'Предохранитель {name} закрыт, сервис снова доступен.'
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(int, Enum):
+    """Состояние предохранителя и его значение в метрике."""
+
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitBreaker:
+    """Предохранитель вызовов внешнего сервиса.
+    После failure_threshold сбоев подряд предохранитель открывается
+    и reset_timeout секунд сразу отклоняет вызовы. Затем он
+    пропускает не более probes пробных вызовов: успешный закрывает
+    предохранитель, неудачный снова открывает.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT, probes=HALF_OPEN_PROBES,
+                 clock=SYSTEM_CLOCK):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probes_left = 0
+        CIRCUIT_STATE.set(self.state.value, name)
+
+    @property
+    def retry_at(self):
+        """Момент, после которого открытый предохранитель пропустит пробу."""
+        if self.opened_at is None:
+            return self.clock.monotonic()
+        return self.opened_at + self.reset_timeout
+
+    def allow(self):
+        """Вернет True, если вызов можно выполнить."""
+        with self.lock:
+            if self.state is CircuitState.OPEN:
+                if self.clock.monotonic() < self.retry_at:
+                    CIRCUIT_REJECTED.inc(self.name)
+                    return False
+                self.switch(CircuitState.HALF_OPEN)
+                self.probes_left = self.probes
+                logger.info(CIRCUIT_HALF_OPENED.format(name=self.name))
+            if self.state is CircuitState.HALF_OPEN:
+                if self.probes_left <= 0:
+                    CIRCUIT_REJECTED.inc(self.name)
+                    return False
+                self.probes_left -= 1
+            return True
+
+    def check(self):
+        """Возбудит CircuitOpenError, если вызов выполнять нельзя."""
+        if not self.allow():
+            raise CircuitOpenError(CIRCUIT_OPEN.format(name=self.name))
+
+    def success(self):
+        """Учтет успешный вызов."""
+        with self.lock:
+            self.failures = 0
+            if self.state is not CircuitState.CLOSED:
+                self.switch(CircuitState.CLOSED)
+                self.opened_at = None
+                logger.info(CIRCUIT_CLOSED.format(name=self.name))
+
+    def failure(self):
+        """Учтет неудачный вызов."""
+        with self.lock:
+            self.failures += 1
+            if self.state is CircuitState.HALF_OPEN or (
+                    self.state is CircuitState.CLOSED
+                    and self.failures >= self.failure_threshold):
+                self.switch(CircuitState.OPEN)
+                self.opened_at = self.clock.monotonic()
+                logger.warning(CIRCUIT_OPENED.format(
+                    name=self.name, failures=self.failures,
+                    seconds=self.reset_timeout
+                ), extra={'template': CIRCUIT_OPENED})
+
+    def switch(self, state):
+        """Переведет предохранитель в состояние state."""
+        self.state = state
+        CIRCUIT_STATE.set(state.value, self.name)
+
+    def stats(self):
+        """Вернет состояние предохранителя в виде словаря."""
+        with self.lock:
+            return {'state': self.state.name, 'failures': self.failures}
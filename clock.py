@@ -0,0 +1,42 @@
+import time
+
+
+class SystemClock:
+    """Часы, показывающие время системы."""
+
+    def time(self):
+        """Вернет текущее время в секундах с начала эпохи."""
+        return time.time()
+
+    def monotonic(self):
+        """Вернет показание монотонных часов."""
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        """Приостановит поток на seconds секунд."""
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """Виртуальные часы для моделирования.
+    Время идет только при вызове sleep, который не ждет,
+    а сразу переводит часы вперед.
+    """
+
+    def __init__(self, start=0):
+        self.now = start
+
+    def time(self):
+        """Вернет виртуальное время в секундах с начала эпохи."""
+        return self.now
+
+    def monotonic(self):
+        """Вернет виртуальное время."""
+        return self.now
+
+    def sleep(self, seconds):
+        """Переведет часы вперед на seconds секунд."""
+        self.now += max(seconds, 0)
+
+
+SYSTEM_CLOCK = SystemClock()
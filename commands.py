@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+
+from homework import HOMEWORK_VERDICTS
+
+
+STATUS_COMMAND = 'status'
+HISTORY_COMMAND = 'history'
+HISTORY_DATE_FORMAT = '%d.%m.%Y %H:%M'
+
+UNKNOWN_CHAT = 'Этот чат не подписан на статусы проверки работ.'
+NO_HOMEWORKS = 'Данных о ваших работах пока нет.'
+STATUS_HEADER = 'Статусы ваших работ:'
+STATUS_LINE = '"{homework_name}". {verdict}'
+HISTORY_HEADER = 'Последние изменения статусов:'
+HISTORY_LINE = '{date} "{homework_name}". {verdict}'
+COMMANDS_STARTED = 'Бот принимает команды /{status} и /{history}.'
+
+
+logger = logging.getLogger(__name__)
+
+
+def format_status(tenant):
+    """Вернет текущие статусы работ студента."""
+    if tenant is None:
+        return UNKNOWN_CHAT
+    statuses = list(tenant.statuses.items())
+    if not statuses:
+        return NO_HOMEWORKS
+    return '\n'.join([STATUS_HEADER] + [
+        STATUS_LINE.format(
+            homework_name=tenant.names.get(key, key),
+            verdict=HOMEWORK_VERDICTS[status.value]
+        )
+        for key, status in statuses
+    ])
+
+
+def format_history(tenant):
+    """Вернет последние изменения статусов работ студента."""
+    if tenant is None:
+        return UNKNOWN_CHAT
+    history = list(tenant.history)
+    if not history:
+        return NO_HOMEWORKS
+    return '\n'.join([HISTORY_HEADER] + [
+        HISTORY_LINE.format(
+            date=format_date(homework.date_updated),
+            homework_name=homework.homework_name,
+            verdict=HOMEWORK_VERDICTS[homework.status.value]
+        ).lstrip()
+        for homework in reversed(history)
+    ])
+
+
+def format_date(timestamp):
+    """Вернет дату изменения статуса или пустую строку."""
+    if timestamp is None:
+        return ''
+    return time.strftime(HISTORY_DATE_FORMAT, time.gmtime(timestamp))
+
+
+def register_commands(bot, tenants, send, lookup=None):
+    """Зарегистрирует обработчики команд бота.
+    Ответы строятся только по состоянию студентов tenants
+    и передаются в send(chat_id, text), поэтому команды
+    не вызывают запросов к API Практикум.Домашка.
+    Состояние студентов, которых опрашивают другие процессы,
+    возвращает lookup(chat_id).
+    """
+    chats = {str(tenant.chat_id): tenant for tenant in tenants}
+
+    def find(chat_id):
+        tenant = chats.get(str(chat_id))
+        if tenant is None and lookup is not None:
+            return lookup(chat_id)
+        return tenant
+
+    @bot.message_handler(commands=[STATUS_COMMAND])
+    def status(message):
+        send(message.chat.id, format_status(find(message.chat.id)))
+
+    @bot.message_handler(commands=[HISTORY_COMMAND])
+    def history(message):
+        send(message.chat.id, format_history(find(message.chat.id)))
+
+    return bot
+
+
+def start_commands(bot, tenants, send, lookup=None):
+    """Запустит прием команд бота в фоновом потоке."""
+    register_commands(bot, tenants, send, lookup)
+    threading.Thread(target=bot.infinity_polling, daemon=True).start()
+    logger.info(COMMANDS_STARTED.format(
+        status=STATUS_COMMAND, history=HISTORY_COMMAND
+    ))
@@ -0,0 +1,60 @@
+import os
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+CURSOR_SKEW = int(os.getenv('CURSOR_SKEW', 60))
+
+
+class CursorManager:
+    """Отметки, с которых продолжается опрос API для студента.
+    Общая отметка tenant.timestamp - метка current_date из последнего
+    обработанного ответа, а если ее нет, наибольшая дата изменения
+    полученных работ. Запрос отступает от нее на skew секунд, чтобы
+    не потерять изменения, записанные с опозданием или с расхождением
+    часов серверов. Повторно полученные версии работ из перекрытия
+    не дают изменений статуса, а версии старше уже обработанных
+    отбрасываются по отметкам отдельных работ tenant.marks.
+    """
+
+    def __init__(self, skew=CURSOR_SKEW):
+        self.skew = skew
+
+    def from_date(self, tenant):
+        """Вернет начало окна следующего запроса к API."""
+        return max(tenant.timestamp - self.skew, 0)
+
+    def fresh(self, tenant, homeworks):
+        """Вернет работы, не уступающие по дате уже обработанным версиям."""
+        marks = tenant.marks
+        return [
+            homework for homework in homeworks
+            if homework.date_updated is None
+            or homework.date_updated >= marks.get(homework.key, 0)
+        ]
+
+    def advance(self, tenant, response_data, homeworks=()):
+        """Передвинет отметки после обработки ответа API.
+        Отметки работ, выпавших из окна следующего запроса, удаляются.
+        """
+        marks = tenant.marks
+        for homework in homeworks:
+            if homework.date_updated is not None:
+                marks[homework.key] = max(
+                    marks.get(homework.key, 0), homework.date_updated
+                )
+        current_date = response_data.get('current_date')
+        if current_date is None:
+            current_date = max(
+                [homework.date_updated for homework in homeworks
+                 if homework.date_updated is not None] + [tenant.timestamp]
+            )
+        tenant.timestamp = current_date
+        start = self.from_date(tenant)
+        for key in [key for key, mark in marks.items() if mark < start]:
+            del marks[key]
+
+
+CURSORS = CursorManager()
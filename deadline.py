@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from clock import SYSTEM_CLOCK
+from exceptions import DeadlineExceeded
+
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 27
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+DEADLINE_EXCEEDED = 'Истек срок итерации опроса в {seconds} с.'
+
+DEADLINE = ContextVar('deadline', default=None)
+
+
+class Deadline:
+    """Срок, к которому должна завершиться итерация опроса.
+    Запрос к API и отправка сообщений в одной итерации делят его,
+    получая тайм-ауты из оставшегося времени.
+    """
+
+    def __init__(self, seconds, clock=SYSTEM_CLOCK):
+        self.seconds = seconds
+        self.clock = clock
+        self.expires = clock.monotonic() + seconds
+
+    def remaining(self):
+        """Вернет число секунд до истечения срока."""
+        return max(self.expires - self.clock.monotonic(), 0)
+
+    def expired(self):
+        """Вернет True, если срок истек."""
+        return self.remaining() <= 0
+
+    def timeout(self, connect=CONNECT_TIMEOUT, read=READ_TIMEOUT):
+        """Вернет тайм-ауты соединения и чтения, не выходящие за срок.
+        Если срок истек, возбудит DeadlineExceeded.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(
+                DEADLINE_EXCEEDED.format(seconds=self.seconds)
+            )
+        return min(connect, remaining), min(read, remaining)
+
+
+@contextmanager
+def deadline_context(seconds, clock=SYSTEM_CLOCK):
+    """Задаст срок для запросов в блоке и вернет объект Deadline."""
+    deadline = Deadline(seconds, clock)
+    token = DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        DEADLINE.reset(token)
+
+
+def request_timeout(default=REQUEST_TIMEOUT):
+    """Вернет тайм-ауты запроса с учетом текущего срока.
+    Вне deadline_context вернет default.
+    """
+    deadline = DEADLINE.get()
+    if deadline is None:
+        return default
+    return deadline.timeout(*default)
+
+
+def send_timeout():
+    """Вернет тайм-аут отправки сообщения с учетом текущего срока.
+    Вне deadline_context вернет None, после истечения срока
+    возбудит DeadlineExceeded.
+    """
+    deadline = DEADLINE.get()
+    if deadline is None:
+        return None
+    return deadline.timeout()[1]
+
+
+def remaining_time():
+    """Вернет время до истечения текущего срока или None."""
+    deadline = DEADLINE.get()
+    return None if deadline is None else deadline.remaining()
@@ -0,0 +1,144 @@
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from homework import HOMEWORK_STATUS_IS_CHANGED, HOMEWORK_VERDICTS
+from outbox import JOURNAL_ERROR
+from records import STATUSES
+
+
+DIGEST_WINDOW = int(os.getenv('DIGEST_WINDOW', 0))
+
+HOMEWORK_STATUSES_DIGEST = 'Изменились статусы проверки работ:\n{changes}'
+DIGEST_LINE = '"{homework_name}". {verdict}'
+CHANGES_RECOVERED = 'Из журнала {path} восстановлено изменений: {count}.'
+
+
+logger = logging.getLogger(__name__)
+
+
+class DigestBuffer:
+    """Сводка изменений статусов для каждого чата.
+    Изменения копятся window секунд с первого изменения в чате
+    и отправляются одним сообщением. Если статус работы за это время
+    менялся несколько раз, в сводку попадает только последний.
+    Если задан журнал journal, изменение считается принятым только
+    после записи в него и удаляется из журнала, когда send примет
+    сводку, поэтому изменения не теряются при перезапуске.
+    """
+
+    def __init__(self, send, window=DIGEST_WINDOW, journal=None):
+        self.send = send
+        self.window = window
+        self.journal = journal
+        self.buffers = {}
+        self.keys = {}
+        self.deadlines = []
+        self.condition = threading.Condition()
+
+    def start(self, chat_ids=None):
+        """Запустит фоновую отправку накопленных сводок.
+        Изменения, оставшиеся в журнале, снова добавляются в сводки.
+        Если задан chat_ids, добавляются только изменения этих чатов.
+        """
+        if self.journal is not None:
+            pending = self.journal.pending(chat_ids)
+            for journal_key, chat_id, change in pending:
+                key, homework_name, status = json.loads(change)
+                self.buffer(chat_id, key, homework_name, STATUSES[status],
+                            journal_key)
+            if pending:
+                logger.info(CHANGES_RECOVERED.format(
+                    path=self.journal.path, count=len(pending)
+                ))
+        threading.Thread(target=self.work, daemon=True).start()
+        return self
+
+    def add(self, chat_id, homework):
+        """Добавит изменение статуса работы в сводку для чата chat_id.
+        Вернет False, если изменение не удалось записать в журнал.
+        """
+        journal_key = None
+        if self.journal is not None:
+            try:
+                journal_key = self.journal.add(chat_id, json.dumps(
+                    [homework.key, homework.homework_name,
+                     homework.status.value], ensure_ascii=False
+                ))
+            except sqlite3.Error as error:
+                logger.error(JOURNAL_ERROR.format(
+                    path=self.journal.path, error=error
+                ), extra={'template': JOURNAL_ERROR})
+                return False
+        self.buffer(chat_id, homework.key, homework.homework_name,
+                    homework.status, journal_key)
+        return True
+
+    def buffer(self, chat_id, key, homework_name, status, journal_key=None):
+        """Добавит изменение в сводку чата и запомнит его номер в журнале."""
+        with self.condition:
+            buffer = self.buffers.get(chat_id)
+            if buffer is None:
+                buffer = self.buffers[chat_id] = {}
+                heapq.heappush(
+                    self.deadlines, (time.monotonic() + self.window, chat_id)
+                )
+                self.condition.notify()
+            buffer.pop(key, None)
+            buffer[key] = (homework_name, status)
+            if journal_key is not None:
+                self.keys.setdefault(chat_id, []).append(journal_key)
+
+    def work(self):
+        """Цикл фоновой отправки сводок."""
+        while True:
+            with self.condition:
+                while not self.deadlines or (
+                        self.deadlines[0][0] > time.monotonic()):
+                    self.condition.wait(
+                        self.deadlines[0][0] - time.monotonic()
+                        if self.deadlines else None
+                    )
+                _, chat_id = heapq.heappop(self.deadlines)
+                buffer = self.buffers.pop(chat_id)
+                keys = self.keys.pop(chat_id, [])
+            self.deliver(chat_id, buffer, keys)
+
+    def flush(self):
+        """Немедленно отправит все накопленные сводки."""
+        with self.condition:
+            buffers, self.buffers, self.deadlines = self.buffers, {}, []
+            keys, self.keys = self.keys, {}
+        for chat_id, buffer in buffers.items():
+            self.deliver(chat_id, buffer, keys.get(chat_id, []))
+
+    def deliver(self, chat_id, buffer, keys):
+        """Передаст сводку в send и удалит ее изменения из журнала.
+        Если send не принял сводку, изменения остаются в журнале
+        до перезапуска.
+        """
+        if self.send(chat_id, format_digest(buffer.values())):
+            for key in keys:
+                self.journal.remove(key)
+
+
+def format_digest(changes):
+    """Вернет текст сводки по парам (название работы, HomeworkStatus)."""
+    changes = list(changes)
+    if len(changes) == 1:
+        homework_name, status = changes[0]
+        return HOMEWORK_STATUS_IS_CHANGED.format(
+            homework_name=homework_name,
+            verdict=HOMEWORK_VERDICTS[status.value]
+        )
+    return HOMEWORK_STATUSES_DIGEST.format(changes='\n'.join(
+        DIGEST_LINE.format(
+            homework_name=homework_name,
+            verdict=HOMEWORK_VERDICTS[status.value]
+        )
+        for homework_name, status in changes
+    ))
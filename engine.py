@@ -0,0 +1,316 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import heapq
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from telebot import TeleBot
+
+from breaker import CircuitBreaker
+from clock import SYSTEM_CLOCK
+from commands import start_commands
+from digest import DIGEST_WINDOW, DigestBuffer
+from homework import (ENDPOINT, OUTBOX_FILE, PRACTICUM_TOKEN, RETRY_PERIOD,
+                      STATE_FILE, TELEGRAM_CHAT_ID, poll_api,
+                      send_message_to_chat)
+from leases import LEASE_FILE, LeaseStore, replica_path
+from logs import configure_logging
+from metrics import METRICS_PORT, SCHEDULE_LAG_SECONDS, start_http_server
+from outbox import GLOBAL_RATE, MessageJournal, TelegramOutbox
+from policy import PollingPolicy
+from retry import RetryPolicy
+from sharding import (HashRing, partition_path, partition_paths,
+                      select_shard)
+from shutdown import SHUTDOWN_TIMEOUT, handle_signals
+from storage import StateStore
+from tenants import Tenant, load_tenants
+from transport import ResponseCache, Transport
+
+
+load_dotenv()
+
+TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+TENANTS_FILE = os.getenv('TENANTS_FILE', 'tenants.json')
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', 32))
+PREWARM_AHEAD = 5
+PRACTICUM_CIRCUIT = 'practicum'
+TELEGRAM_CIRCUIT = 'telegram'
+
+TELEGRAM_TOKEN_NOT_FOUND = 'Не обнаружена переменная окружения TELEGRAM_TOKEN'
+ENGINE_STARTED = 'Запущен опрос API для {count} студентов.'
+ENGINE_STOPPED = 'Опрос API остановлен, состояние сохранено.'
+POLLS_NOT_FINISHED = 'Начатые опросы API не завершились за {timeout} с.'
+
+
+logger = logging.getLogger(__name__)
+
+
+class PollingEngine:
+    """Планировщик опроса API Практикум.Домашка для множества студентов.
+    Одновременно выполняется не более max_workers запросов.
+    Время расписания берется из clock, а опросы выполняет executor,
+    поэтому при моделировании их можно заменить.
+    Если задано хранилище аренд lease, опрашиваются только студенты,
+    аренду которых удалось захватить, остальные проверяются снова
+    через lease.ttl секунд.
+    """
+
+    def __init__(self, bot, tenants, max_workers=MAX_WORKERS,
+                 retry_period=RETRY_PERIOD, transport=None, policy=None,
+                 store=None, outbox=None, digest=None, cache=None,
+                 clock=SYSTEM_CLOCK, executor=None, lease=None):
+        self.bot = bot
+        self.clock = clock
+        self.cache = cache
+        self.store = store
+        self.lease = lease
+        self.outbox = outbox
+        self.digest = digest
+        self.transport = transport or Transport(
+            pool_size=max_workers, retry=RetryPolicy()
+        )
+        self.policy = policy or PollingPolicy(retry_period)
+        self.retry_period = retry_period
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers
+        )
+        self.max_workers = max_workers
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        now = clock.monotonic()
+        step = retry_period / max(len(tenants), 1)
+        self.schedule = [(now + index * step, index, tenant)
+                         for index, tenant in enumerate(tenants)]
+        heapq.heapify(self.schedule)
+
+    def run_pending(self):
+        """Запустит опрос студентов, для которых подошло время.
+        Вернет число секунд до следующего запланированного опроса.
+        """
+        while not self.stopping.is_set():
+            with self.lock:
+                if not self.schedule:
+                    return self.retry_period
+                due, index, tenant = self.schedule[0]
+                delay = due - self.clock.monotonic()
+                if delay > 0:
+                    return delay
+                heapq.heappop(self.schedule)
+            self.slots.acquire()
+            self.executor.submit(self.poll, index, tenant, due)
+        return self.retry_period
+
+    def poll(self, index, tenant, due):
+        """Опросит API для студента и запланирует следующий опрос."""
+        SCHEDULE_LAG_SECONDS.observe(max(self.clock.monotonic() - due, 0))
+        delay = self.retry_period
+        try:
+            if self.lease is not None and not self.lease.acquire(tenant):
+                delay = self.lease.ttl
+                return
+            delay = self.policy.next_delay(tenant, *poll_api(
+                tenant, self.sender(tenant), self.transport,
+                self.notifier(tenant), self.cache
+            ))
+            if self.store is not None:
+                self.store.save(tenant)
+            if self.lease is not None:
+                self.lease.save(tenant)
+        finally:
+            self.reschedule(index, tenant, delay)
+            self.slots.release()
+
+    def sender(self, tenant):
+        """Вернет функцию отправки сообщения в чат студента.
+        Если задана очередь исходящих сообщений, сообщения ставятся в нее.
+        """
+        if self.outbox is not None:
+            return partial(self.outbox.send, tenant.chat_id)
+        return partial(send_message_to_chat, self.bot, tenant.chat_id)
+
+    def notifier(self, tenant):
+        """Вернет функцию, добавляющую изменения в сводку для студента.
+        Если режим сводок выключен, вернет None.
+        """
+        if self.digest is None:
+            return None
+        return partial(self.digest.add, tenant.chat_id)
+
+    def reschedule(self, index, tenant, delay):
+        """Запланирует опрос студента через delay секунд."""
+        with self.lock:
+            heapq.heappush(
+                self.schedule, (self.clock.monotonic() + delay, index, tenant)
+            )
+        self.wakeup.set()
+
+    def run(self):
+        """Основной цикл планировщика.
+        Завершается после вызова stop.
+        """
+        logger.info(ENGINE_STARTED.format(count=len(self.schedule)))
+        while not self.stopping.is_set():
+            delay = self.run_pending()
+            if delay > PREWARM_AHEAD:
+                if self.wait(delay - PREWARM_AHEAD):
+                    continue
+                self.transport.prewarm(ENDPOINT)
+                delay = PREWARM_AHEAD
+            self.wait(delay)
+
+    def stop(self):
+        """Прекратит запуск новых опросов и прервет ожидание в run.
+        Может вызываться из обработчика сигнала.
+        """
+        self.stopping.set()
+        self.wakeup.set()
+
+    def shutdown(self, timeout):
+        """Остановит планировщик и дождется завершения начатых опросов.
+        Вернет False, если за timeout секунд они не завершились.
+        """
+        self.stop()
+        deadline = time.monotonic() + timeout
+        for _ in range(self.max_workers):
+            if not self.slots.acquire(
+                    timeout=max(deadline - time.monotonic(), 0)):
+                logger.warning(
+                    POLLS_NOT_FINISHED.format(timeout=timeout),
+                    extra={'template': POLLS_NOT_FINISHED}
+                )
+                return False
+        self.executor.shutdown(wait=False)
+        return True
+
+    def wait(self, delay):
+        """Подождет delay секунд или до появления нового опроса в расписании.
+        Вернет True, если ожидание прервано досрочно.
+        """
+        woken = self.wakeup.wait(delay)
+        self.wakeup.clear()
+        return woken
+
+
+def registry_tenants(timestamp):
+    """Вернет студентов из реестра TENANTS_FILE.
+    Если реестра нет, но заданы PRACTICUM_TOKEN и TELEGRAM_CHAT_ID,
+    вернет одного студента, как homework.py.
+    """
+    if (not os.path.exists(TENANTS_FILE)
+            and PRACTICUM_TOKEN and TELEGRAM_CHAT_ID):
+        return [Tenant(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID, timestamp)]
+    return load_tenants(TENANTS_FILE, timestamp)
+
+
+def shard_lookup(tenants, state_file, shards):
+    """Вернет функцию поиска состояния студента из любого раздела.
+    Состояние читается из файла раздела студента при каждом вызове,
+    поэтому отстает от процесса этого раздела не больше чем
+    на период автоматической записи состояния.
+    """
+    ring = HashRing(shards)
+    registry = {str(tenant.chat_id): tenant for tenant in tenants}
+
+    def lookup(chat_id):
+        known = registry.get(str(chat_id))
+        if known is None:
+            return None
+        tenant = Tenant(known.token, known.chat_id)
+        StateStore(partition_path(
+            state_file, ring.shard_for(known.chat_id), shards
+        )).restore(tenant)
+        return tenant
+
+    return lookup
+
+
+def main(shard=0, shards=1):
+    """Запустит опрос API для студентов из реестра.
+    Студенты берутся из registry_tenants.
+    Если процессов shards несколько, опрашиваются только студенты
+    процесса shard, а состояние хранится в отдельном разделе.
+    Команды бота принимает процесс 0 для студентов всех разделов.
+    Если задан LEASE_FILE, экземпляры бота делят студентов по арендам,
+    а файлы состояния и журналы у каждого экземпляра свои.
+    Сообщения перед отправкой записываются в журнал OUTBOX_FILE,
+    а неотправленные сообщения студентов процесса из журналов
+    прежних разделов переносятся в его журнал.
+    По сигналу SIGTERM или SIGINT дождется начатых опросов и отправки
+    сообщений из очереди, сохранит состояние и вернет False,
+    если это не удалось за SHUTDOWN_TIMEOUT секунд.
+    """
+    if TELEGRAM_TOKEN is None:
+        logger.critical(TELEGRAM_TOKEN_NOT_FOUND)
+        raise ValueError(TELEGRAM_TOKEN_NOT_FOUND)
+    bot = TeleBot(token=TELEGRAM_TOKEN)
+    registry = registry_tenants(int(time.time()))
+    tenants = select_shard(registry, shard, shards)
+    state_file, outbox_file = STATE_FILE, OUTBOX_FILE
+    if LEASE_FILE is not None:
+        state_file = replica_path(STATE_FILE)
+        outbox_file = replica_path(OUTBOX_FILE)
+    store = StateStore(partition_path(state_file, shard, shards))
+    store.merge(partition_paths(state_file))
+    for tenant in tenants:
+        store.restore(tenant)
+    store.autoflush()
+    start_http_server(
+        None if METRICS_PORT is None else int(METRICS_PORT) + shard
+    )
+    chat_ids = [tenant.chat_id for tenant in tenants]
+    journal = MessageJournal(partition_path(outbox_file, shard, shards))
+    journal.merge(partition_paths(outbox_file), chat_ids)
+    outbox = TelegramOutbox(
+        bot, global_rate=GLOBAL_RATE / shards,
+        breaker=CircuitBreaker(TELEGRAM_CIRCUIT), journal=journal
+    ).start(chat_ids)
+    if shard == 0:
+        start_commands(bot, tenants, outbox.send, None if shards == 1 else (
+            shard_lookup(registry, state_file, shards)
+        ))
+    lease = None
+    if LEASE_FILE is not None:
+        lease = LeaseStore(LEASE_FILE).start()
+    digest = None
+    if DIGEST_WINDOW:
+        changes = MessageJournal(
+            partition_path(outbox_file, shard, shards), table='digest'
+        )
+        changes.merge(partition_paths(outbox_file), chat_ids)
+        digest = DigestBuffer(
+            outbox.send, DIGEST_WINDOW, changes
+        ).start(chat_ids)
+    engine = PollingEngine(
+        bot, tenants, store=store, outbox=outbox, digest=digest,
+        cache=ResponseCache(), transport=Transport(
+            pool_size=MAX_WORKERS, retry=RetryPolicy(),
+            breaker=CircuitBreaker(PRACTICUM_CIRCUIT)
+        ), lease=lease
+    )
+    handle_signals(engine.stop)
+    engine.run()
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    finished = engine.shutdown(SHUTDOWN_TIMEOUT)
+    if digest is not None:
+        digest.flush()
+    finished = outbox.close(max(deadline - time.monotonic(), 0)) and finished
+    store.flush()
+    if lease is not None:
+        lease.close()
+    logger.info(ENGINE_STOPPED)
+    return finished
+
+
+if __name__ == '__main__':
+    listener = configure_logging(__file__ + '.log')
+    if not main():
+        # Потоки с незавершенными запросами не дают интерпретатору
+        # завершиться, поэтому после истечения SHUTDOWN_TIMEOUT
+        # процесс завершается принудительно.
+        listener.stop()
+        os._exit(1)
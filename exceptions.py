@@ -4,3 +4,15 @@ class UnsuccessfulResponseError(Exception):
 
 class ServerError(Exception):
     pass
+
+
+class ShutdownRequested(BaseException):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
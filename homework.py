@@ -1,15 +1,27 @@
 from http import HTTPStatus
 import logging
-import logging.handlers
 import os
-import sys
 import time
 
 from dotenv import load_dotenv
 from telebot import TeleBot
 import requests
 
-from exceptions import UnsuccessfulResponseError, ServerError
+from cursor import CURSORS
+from deadline import deadline_context, request_timeout, send_timeout
+from exceptions import (CircuitOpenError, ServerError, ShutdownRequested,
+                        UnsuccessfulResponseError)
+from leases import LEASE_FILE, LeaseStore, replica_path
+from logs import configure_logging, log_context
+from metrics import (API_REQUEST_SECONDS, POLL_DEADLINE_OVERRUNS, POLL_SECONDS,
+                     TELEGRAM_SEND_FAILURES, TELEGRAM_SEND_SECONDS,
+                     start_http_server, timed)
+from outbox import (FAILED_SENDING, SUCCESSFUL_SENDING, MessageJournal,
+                    TelegramOutbox)
+from records import Homework
+from shutdown import ShutdownFlag, handle_signals, restore_signals
+from storage import StateStore
+from tenants import Tenant
 
 
 load_dotenv()
@@ -17,11 +29,14 @@ load_dotenv()
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+STATE_FILE = os.getenv('STATE_FILE', __file__ + '.state.json')
+OUTBOX_FILE = os.getenv('OUTBOX_FILE', __file__ + '.outbox.db')
 
 REQUIRED_CONSTANTS_NAMES = ['PRACTICUM_TOKEN', 'TELEGRAM_TOKEN',
                             'TELEGRAM_CHAT_ID']
 
 RETRY_PERIOD = 600
+POLL_DEADLINE = int(os.getenv('POLL_DEADLINE', 60))
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
@@ -31,13 +46,7 @@ HOMEWORK_VERDICTS = {
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
 
-LOG_FORMAT = ('%(asctime)s - %(name)s - [%(levelname)s] - '
-              '%(filename)s: %(funcName)s: %(lineno)s - %(message)s')
-
 CHECK_TOKENS_ERROR = 'Не обнаружены переменные окружения: {not_found_vars}'
-FAILED_SENDING = ('При отправке сообщения "{message}" возникла следующая '
-                  'ошибка: {error}.')
-SUCCESSFUL_SENDING = 'Успешная отправка сообщения: "{message}".'
 REQUEST_ERROR = (
     'Сбой сети! При выполнении GET-запроса с использованием '
     'requests.get() со следующими параметрами: {request_params} '
@@ -58,14 +67,13 @@ KEY_NOT_FOUND_IN_RESPONSE = ('Ожидаемый ключ {key} отсутств
                              ' ответе API.')
 WRONG_DATA_TYPE = ('Неожиданный тип данных {data_type}, '
                    'полученных по ключу {key}.')
-KEY_NOT_FOUND_IN_HOMEWORK = ('Ожидаемый ключ {key} отсутствует '
-                             'в данных о домашней работе.')
-WRONG_HOMEWORK_STATUS = ('Неожиданный статус домашней работы "{status}", '
-                         'обнаруженный в ответе API.')
 HOMEWORK_STATUS_IS_CHANGED = ('Изменился статус проверки работы '
                               '"{homework_name}". {verdict}')
 HOMEWORK_STATUS_NOT_CHANGED = 'Статус работы не изменился.'
 ERROR_MESSAGE = 'Сбой в работе программы: {error}'
+POLL_DEADLINE_EXCEEDED = ('Итерация опроса не уложилась в {seconds} с '
+                          'и заняла {elapsed:.1f} с.')
+BOT_STOPPED = 'Бот остановлен, состояние опроса сохранено.'
 
 
 logger = logging.getLogger(__name__)
@@ -83,11 +91,26 @@ def check_tokens():
 
 def send_message(bot, message):
     """Отправит сообщение "message" в Телеграм. В случае успеха вернет True."""
+    return send_message_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_message_to_chat(bot, chat_id, message):
+    """Отправит сообщение "message" в чат chat_id.
+    Внутри итерации опроса тайм-аут отправки ограничен ее сроком.
+    В случае успеха вернет True.
+    """
+    started = time.monotonic()
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
-        logger.debug(SUCCESSFUL_SENDING.format(message=message))
+        bot.send_message(chat_id, message, timeout=send_timeout())
+        TELEGRAM_SEND_SECONDS.observe(time.monotonic() - started, 'ok')
+        logger.debug(
+            SUCCESSFUL_SENDING.format(message=message),
+            extra={'template': SUCCESSFUL_SENDING}
+        )
         return True
     except Exception as error:
+        TELEGRAM_SEND_SECONDS.observe(time.monotonic() - started, 'error')
+        TELEGRAM_SEND_FAILURES.inc()
         logger.exception(FAILED_SENDING.format(message=message, error=error))
 
 
@@ -95,18 +118,47 @@ def get_api_answer(timestamp):
     """Сделает запрос к API Практикум.Домашка.
     В случе успеха вернет ответ API в виде словаря.
     """
+    return request_api_answer(timestamp, HEADERS)
+
+
+@timed(API_REQUEST_SECONDS, (ServerError, UnsuccessfulResponseError,
+                             ConnectionError, CircuitOpenError))
+def request_api_answer(timestamp, headers, transport=None, cache=None):
+    """Сделает запрос к API Практикум.Домашка с заголовками headers.
+    Если передан transport, запрос выполняется через его пул соединений.
+    Если передан cache и ответ не изменился с последнего обработанного,
+    вернет None, не декодируя ответ.
+    В случе успеха вернет ответ API в виде словаря.
+    """
     request_params = {
         'url': ENDPOINT,
-        'headers': HEADERS,
+        'headers': headers if cache is None else cache.prepare(headers),
         'params': {'from_date': timestamp},
     }
+    response = send_api_request(request_params, transport)
+    if cache is not None and cache.unchanged(headers, response):
+        return None
+    response_json = response.json()
+    check_api_errors(response_json, response.status_code, request_params)
+    return response_json
+
+
+def send_api_request(request_params, transport=None):
+    """Выполнит GET-запрос к API с параметрами request_params.
+    Сбой сети превращается в ConnectionError.
+    """
     try:
-        response = requests.get(**request_params)
+        if transport is None:
+            return requests.get(timeout=request_timeout(), **request_params)
+        return transport.get(**request_params)
     except requests.RequestException as error:
         raise ConnectionError(
             REQUEST_ERROR.format(request_params=request_params, error=error)
         )
-    response_json = response.json()
+
+
+def check_api_errors(response_json, response_status, request_params):
+    """Проверит, что API не сообщил об ошибке и вернул код 200."""
     error_info = {key: response_json[key] for key in ['code', 'error']
                   if key in response_json}
     if error_info:
@@ -114,13 +166,11 @@ def get_api_answer(timestamp):
             request_params=request_params,
             error_info=error_info
         ))
-    response_status = response.status_code
     if response_status != HTTPStatus.OK:
         raise UnsuccessfulResponseError(UNSUCCESSFUL_RESPONSE.format(
             request_params=request_params,
             response_status=response_status
         ))
-    return response_json
 
 
 def check_response(response):
@@ -148,59 +198,183 @@ def parse_status(homework):
     В случае соответствия данных ожидаемому формату
     вернет строку с иформацией о статусе данной работы.
     """
-    if 'homework_name' not in homework:
-        raise KeyError(KEY_NOT_FOUND_IN_HOMEWORK.format(key='homework_name'))
-    if 'status' not in homework:
-        raise KeyError(KEY_NOT_FOUND_IN_HOMEWORK.format(key='status'))
-    status = homework['status']
-    if status not in HOMEWORK_VERDICTS:
-        raise ValueError(WRONG_HOMEWORK_STATUS.format(status=status))
+    return status_message(Homework.from_dict(homework))
+
+
+def status_message(homework):
+    """Вернет сообщение о статусе работы по записи Homework."""
     return HOMEWORK_STATUS_IS_CHANGED.format(
-        homework_name=homework['homework_name'],
-        verdict=HOMEWORK_VERDICTS[status]
+        homework_name=homework.homework_name,
+        verdict=HOMEWORK_VERDICTS[homework.status.value]
     )
 
 
-def main():
-    """Основной цикл работы бота."""
-    check_tokens()
-    bot = TeleBot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    last_message = None
+def get_status_changes(homeworks, statuses):
+    """Сравнит записи о работах с индексом статусов statuses.
+    Вернет работы, статус которых изменился, в порядке date_updated.
+    Если работа встречается несколько раз, учитывается последнее
+    по date_updated состояние.
+    """
+    latest = {}
+    for homework in homeworks:
+        known = latest.get(homework.key)
+        if known is None or (homework.date_updated or 0) >= (
+                known.date_updated or 0):
+            latest[homework.key] = homework
+    return sorted(
+        (homework for key, homework in latest.items()
+         if statuses.get(key) != homework.status),
+        key=lambda homework: homework.date_updated or 0
+    )
+
+
+def deliver_changes(tenant, response_data, send, notify=None):
+    """Отправит сообщения об изменившихся статусах работ из ответа API.
+    Вернет True, если все изменения доставлены.
+    """
+    homeworks = response_data['homeworks']
+    if not homeworks:
+        logger.debug(HOMEWORK_STATUS_NOT_CHANGED)
+        CURSORS.advance(tenant, response_data)
+        return True
+    records = CURSORS.fresh(
+        tenant, [Homework.from_dict(homework) for homework in homeworks]
+    )
+    for homework in records:
+        tenant.names[homework.key] = homework.homework_name
+    changes = get_status_changes(records, tenant.statuses)
+    if not changes:
+        logger.debug(HOMEWORK_STATUS_NOT_CHANGED)
+    for homework in changes:
+        message = status_message(homework)
+        if not (send(message) if notify is None else notify(homework)):
+            return False
+        tenant.last_message = message
+        tenant.statuses[homework.key] = homework.status
+        tenant.history.append(homework)
+    CURSORS.advance(tenant, response_data, records)
+    return True
+
 
-    while True:
+def poll_api(tenant, send, transport=None, notify=None, cache=None):
+    """Выполнит одну итерацию опроса API для студента tenant.
+    Сообщения о новом статусе работы и об ошибках передаются в send.
+    Об открытом предохранителе студенту не сообщается: сбой сервиса
+    уже описан в сообщении об ошибке, которая его открыла.
+    Если передан notify, изменившиеся работы передаются в него
+    вместо отправки отдельных сообщений.
+    Если передан cache, неизменившиеся ответы API пропускаются.
+    Запрос к API и отправка сообщений должны уложиться
+    в POLL_DEADLINE секунд.
+    Вернет кортеж из списка полученных работ и возникшей ошибки.
+    """
+    started = time.monotonic()
+    tenant.iteration += 1
+    with log_context(tenant.chat_id, tenant.iteration), deadline_context(
+            POLL_DEADLINE) as deadline:
         try:
-            response_data = check_response(get_api_answer(timestamp))
-            homeworks = response_data['homeworks']
-            if not homeworks:
-                logger.debug(HOMEWORK_STATUS_NOT_CHANGED)
-                continue
-            message = parse_status(homeworks[0])
-            if last_message != message:
-                if send_message(bot, message):
-                    timestamp = response_data.get('current_date', timestamp)
-                    last_message = message
+            return fetch_and_deliver(tenant, send, transport, notify, cache)
+        except CircuitOpenError as error:
+            logger.warning(
+                ERROR_MESSAGE.format(error=error),
+                extra={'template': ERROR_MESSAGE}
+            )
+            return None, error
         except Exception as error:
             message = ERROR_MESSAGE.format(error=error)
             logger.error(message, exc_info=True)
-            if last_message != message:
-                if send_message(bot, message):
-                    last_message = message
+            if tenant.last_message != message:
+                if send(message):
+                    tenant.last_message = message
+            return None, error
         finally:
-            time.sleep(RETRY_PERIOD)
+            POLL_SECONDS.observe(time.monotonic() - started)
+            if deadline.expired():
+                POLL_DEADLINE_OVERRUNS.inc()
+                logger.warning(POLL_DEADLINE_EXCEEDED.format(
+                    seconds=POLL_DEADLINE,
+                    elapsed=time.monotonic() - started
+                ), extra={'template': POLL_DEADLINE_EXCEEDED})
 
 
-if __name__ == '__main__':
-    logging.basicConfig(
-        format=LOG_FORMAT,
-        level=logging.DEBUG,
-        handlers=[
-            logging.StreamHandler(stream=sys.stdout),
-            logging.handlers.RotatingFileHandler(
-                filename=__file__ + '.log',
-                maxBytes=10_000_000,
-                backupCount=5
-            ),
-        ],
+def fetch_and_deliver(tenant, send, transport=None, notify=None, cache=None):
+    """Запросит ответ API для студента и доставит изменения статусов.
+    Вернет кортеж из списка полученных работ и None.
+    Если ответ не изменился, изменений в нем нет, но отметка опроса
+    все равно передвигается к его current_date.
+    """
+    response_data = request_api_answer(
+        CURSORS.from_date(tenant), tenant.headers, transport, cache
     )
+    if response_data is None:
+        current_date = cache.current_date(tenant.headers)
+        if current_date is not None:
+            CURSORS.advance(tenant, {'current_date': current_date})
+        return [], None
+    response_data = check_response(response_data)
+    delivered = deliver_changes(tenant, response_data, send, notify)
+    if delivered and cache is not None:
+        cache.commit(tenant.headers)
+    return response_data['homeworks'], None
+
+
+def main():
+    """Основной цикл работы бота.
+    Если задан LEASE_FILE, опрашивает API только экземпляр бота,
+    владеющий арендой чата, поэтому сообщения не дублируются,
+    а файлы состояния и журнал сообщений у каждого экземпляра свои.
+    Сообщения, которые не удалось отправить сразу, записываются
+    в журнал OUTBOX_FILE и отправляются повторно в фоне, а опрос
+    продолжается со следующей метки.
+    По SIGTERM или SIGINT ожидание прерывается сразу, а начатая
+    итерация опроса сначала завершается.
+    """
+    check_tokens()
+    bot = TeleBot(token=TELEGRAM_TOKEN)
+    tenant = Tenant(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID, int(time.time()))
+    state_file, outbox_file = STATE_FILE, OUTBOX_FILE
+    if LEASE_FILE is not None:
+        state_file = replica_path(STATE_FILE)
+        outbox_file = replica_path(OUTBOX_FILE)
+    store = StateStore(state_file)
+    store.restore(tenant)
+    start_http_server()
+    lease = None
+    if LEASE_FILE is not None:
+        lease = LeaseStore(LEASE_FILE).start()
+    outbox = TelegramOutbox(
+        bot, senders=1, journal=MessageJournal(outbox_file)
+    ).start()
+
+    def send(message):
+        return (send_message(bot, message)
+                or outbox.send(TELEGRAM_CHAT_ID, message))
+
+    shutdown = ShutdownFlag()
+    previous_handlers = handle_signals(shutdown.request)
+    try:
+        while True:
+            try:
+                if lease is None or lease.acquire(tenant):
+                    poll_api(tenant, send)
+                    store.save(tenant)
+                    store.flush()
+                    if lease is not None:
+                        lease.save(tenant)
+            finally:
+                with shutdown.waiting():
+                    time.sleep(RETRY_PERIOD)
+    except ShutdownRequested:
+        logger.info(BOT_STOPPED)
+    finally:
+        restore_signals(previous_handlers)
+        outbox.close(0)
+        store.save(tenant)
+        store.flush()
+        if lease is not None:
+            lease.close()
+
+
+if __name__ == '__main__':
+    configure_logging(__file__ + '.log')
     main()
@@ -0,0 +1,198 @@
+from contextlib import contextmanager
+import json
+import logging
+import os
+import re
+import socket
+import sqlite3
+import threading
+
+from dotenv import load_dotenv
+
+from clock import SYSTEM_CLOCK
+from metrics import LEASE_TAKEOVERS, LEASES_HELD
+from storage import dump_state, load_state
+
+
+load_dotenv()
+
+LEASE_FILE = os.getenv('LEASE_FILE')
+LEASE_TTL = int(os.getenv('LEASE_TTL', 30))
+REPLICA_ID = os.getenv('REPLICA_ID')
+REPLICA_SUFFIX = '.{replica}'
+LEASE_SCHEMA = ('CREATE TABLE IF NOT EXISTS leases ('
+                'chat_id TEXT PRIMARY KEY, owner TEXT NOT NULL, '
+                'expires REAL NOT NULL, state TEXT)')
+SELECT_LEASE = 'SELECT owner, expires, state FROM leases WHERE chat_id = ?'
+UPSERT_LEASE = ('INSERT INTO leases (chat_id, owner, expires) '
+                'VALUES (?, ?, ?) ON CONFLICT (chat_id) DO UPDATE '
+                'SET owner = excluded.owner, expires = excluded.expires')
+SAVE_STATE = 'UPDATE leases SET state = ? WHERE chat_id = ? AND owner = ?'
+RENEW_LEASES = 'UPDATE leases SET expires = ? WHERE owner = ?'
+RELEASE_LEASES = 'UPDATE leases SET expires = 0 WHERE owner = ?'
+
+LEASE_TAKEN = 'Студент {chat_id} перешел от экземпляра {owner}.'
+LEASE_ERROR = 'Ошибка хранилища аренд {path}: {error}.'
+LEASES_RELEASED = 'Аренды экземпляра {owner} освобождены.'
+REPLICA_ID_NOT_FOUND = ('При заданном LEASE_FILE не обнаружена переменная '
+                        'окружения REPLICA_ID')
+
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseStore:
+    """Аренды студентов в базе SQLite, общей для экземпляров бота.
+    Опрашивать студента может только экземпляр, владеющий его арендой.
+    Владелец продлевает аренды фоновым потоком каждые ttl / 3 секунд,
+    поэтому аренды остановившегося экземпляра истекают через ttl секунд
+    и переходят к другим. Вместе с арендой хранится состояние опроса:
+    новый владелец продолжает с метки предыдущего и не повторяет
+    уже отправленные сообщения.
+    """
+
+    def __init__(self, path, owner=None, ttl=LEASE_TTL, clock=SYSTEM_CLOCK):
+        self.path = path
+        self.owner = owner or replica_id()
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.held = set()
+        self.stopping = threading.Event()
+        self.connection = sqlite3.connect(
+            path, timeout=ttl / 3, isolation_level=None,
+            check_same_thread=False
+        )
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute(LEASE_SCHEMA)
+
+    def acquire(self, tenant):
+        """Захватит или продлит аренду студента.
+        Вернет False, если студентом владеет другой живой экземпляр
+        или хранилище недоступно. При переходе аренды к этому экземпляру
+        восстановит сохраненное с ней состояние опроса.
+        """
+        chat_id = str(tenant.chat_id)
+        now = self.clock.time()
+        try:
+            with self.lock, self.transaction() as cursor:
+                row = cursor.execute(SELECT_LEASE, (chat_id,)).fetchone()
+                if row is not None and row[0] != self.owner:
+                    self.held.discard(chat_id)
+                    if row[1] > now:
+                        LEASES_HELD.set(len(self.held))
+                        return False
+                cursor.execute(UPSERT_LEASE, (chat_id, self.owner,
+                                              now + self.ttl))
+                taken = chat_id not in self.held
+                self.held.add(chat_id)
+                LEASES_HELD.set(len(self.held))
+        except sqlite3.Error as error:
+            logger.error(
+                LEASE_ERROR.format(path=self.path, error=error),
+                extra={'template': LEASE_ERROR}
+            )
+            return False
+        if taken and row is not None and row[2] is not None:
+            load_state(tenant, json.loads(row[2]))
+            if row[0] != self.owner:
+                LEASE_TAKEOVERS.inc()
+                logger.info(LEASE_TAKEN.format(chat_id=chat_id, owner=row[0]))
+        return True
+
+    def save(self, tenant):
+        """Сохранит состояние опроса студента вместе с его арендой."""
+        state = json.dumps(dump_state(tenant), separators=(',', ':'))
+        try:
+            with self.lock:
+                self.connection.execute(
+                    SAVE_STATE, (state, str(tenant.chat_id), self.owner)
+                )
+        except sqlite3.Error as error:
+            logger.error(
+                LEASE_ERROR.format(path=self.path, error=error),
+                extra={'template': LEASE_ERROR}
+            )
+
+    def renew(self):
+        """Продлит все аренды этого экземпляра на ttl секунд."""
+        try:
+            with self.lock:
+                if self.stopping.is_set():
+                    return
+                self.connection.execute(
+                    RENEW_LEASES, (self.clock.time() + self.ttl, self.owner)
+                )
+        except sqlite3.Error as error:
+            logger.error(
+                LEASE_ERROR.format(path=self.path, error=error),
+                extra={'template': LEASE_ERROR}
+            )
+
+    def release(self):
+        """Освободит аренды, чтобы другие экземпляры забрали их сразу."""
+        with self.lock:
+            self.connection.execute(RELEASE_LEASES, (self.owner,))
+            self.held.clear()
+            LEASES_HELD.set(0)
+        logger.info(LEASES_RELEASED.format(owner=self.owner))
+
+    @contextmanager
+    def transaction(self):
+        """Вернет курсор в транзакции, блокирующей запись другим."""
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+
+    def start(self):
+        """Запустит фоновое продление аренд."""
+        def renew_forever():
+            while not self.stopping.wait(self.ttl / 3):
+                self.renew()
+
+        threading.Thread(target=renew_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        """Остановит продление, освободит аренды и закроет базу."""
+        self.stopping.set()
+        try:
+            self.release()
+        except sqlite3.Error as error:
+            logger.error(
+                LEASE_ERROR.format(path=self.path, error=error),
+                extra={'template': LEASE_ERROR}
+            )
+        with self.lock:
+            self.connection.close()
+
+
+def replica_id():
+    """Вернет идентификатор экземпляра бота.
+    Это REPLICA_ID, если он задан, на Heroku - имя дино,
+    иначе имя хоста и номер процесса.
+    """
+    return (REPLICA_ID or os.getenv('DYNO')
+            or f'{socket.gethostname()}:{os.getpid()}')
+
+
+def replica_path(path):
+    """Вернет путь к файлу path этого экземпляра бота.
+    Экземпляры с общим LEASE_FILE не должны делить файлы состояния
+    и журналы сообщений: иначе один экземпляр перезапишет состояние
+    другого или повторно отправит сообщения из его журнала. Чтобы
+    после перезапуска экземпляр нашел свои файлы, его идентификатор
+    должен быть постоянным: если не заданы ни REPLICA_ID, ни имя дино,
+    выбросит ValueError.
+    """
+    if not (REPLICA_ID or os.getenv('DYNO')):
+        logger.critical(REPLICA_ID_NOT_FOUND)
+        raise ValueError(REPLICA_ID_NOT_FOUND)
+    return path + REPLICA_SUFFIX.format(
+        replica=re.sub(r'[^\w.-]', '_', replica_id())
+    )
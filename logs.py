@@ -0,0 +1,227 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_MAX_BYTES = 10_000_000
+LOG_BACKUP_COUNT = 5
+LOG_DEDUP_PERIOD = int(os.getenv('LOG_DEDUP_PERIOD', 3600))
+LOG_SAMPLE_RATE = int(os.getenv('LOG_SAMPLE_RATE', 100))
+LOG_DEDUP_KEYS = int(os.getenv('LOG_DEDUP_KEYS', 10_000))
+
+LOG_REPEATED = '{message} (повторилось {count} раз за {seconds} с)'
+
+TENANT = ContextVar('tenant', default=None)
+ITERATION = ContextVar('iteration', default=None)
+
+
+class ContextFilter(logging.Filter):
+    """Добавит в запись журнала студента и номер итерации опроса."""
+
+    def filter(self, record):
+        """Запишет поля tenant и iteration из контекста потока."""
+        record.tenant = TENANT.get()
+        record.iteration = ITERATION.get()
+        return True
+
+
+class DedupFilter(logging.Filter):
+    """Прореживает повторяющиеся записи журнала.
+    Записи группируются по отпечатку: для исключения - тип и место,
+    где оно возбуждено, для прочих записей - логгер, уровень и шаблон
+    сообщения. Сообщения в проекте форматируются до записи в журнал,
+    поэтому шаблон передается в поле template: logger.error(
+    TEMPLATE.format(...), extra={'template': TEMPLATE}). Записи без
+    template группируются по точному тексту сообщения.
+    Первая запись о предупреждении или ошибке выводится полностью,
+    повторы в течение period секунд подавляются, а затем выводится
+    одна запись с числом повторов без трассировки. Из записей DEBUG
+    выводится каждая sample_rate-я.
+    Раз в period секунд забываются отпечатки, не встречавшиеся
+    весь период, а сверх max_keys отпечатков забываются самые старые,
+    поэтому память фильтра ограничена.
+    """
+
+    def __init__(self, period=LOG_DEDUP_PERIOD, sample_rate=LOG_SAMPLE_RATE,
+                 clock=time.monotonic, max_keys=LOG_DEDUP_KEYS):
+        super().__init__()
+        self.period = period
+        self.sample_rate = sample_rate
+        self.clock = clock
+        self.max_keys = max_keys
+        self.repeats = {}
+        self.samples = {}
+        self.swept = clock()
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        """Вернет False, если запись нужно пропустить."""
+        key = fingerprint(record)
+        self.sweep()
+        if record.levelno <= logging.DEBUG and not record.exc_info:
+            return self.sample(key)
+        if record.levelno < logging.WARNING:
+            return True
+        return self.deduplicate(key, record)
+
+    def sample(self, key):
+        """Пропустит первую и каждую sample_rate-ю запись с отпечатком."""
+        with self.lock:
+            count = self.samples.pop(key, 0)
+            self.samples[key] = (count + 1) % self.sample_rate
+            evict(self.samples, self.max_keys)
+        return count == 0
+
+    def deduplicate(self, key, record):
+        """Пропустит первую запись серии и периодические сводки."""
+        now = self.clock()
+        with self.lock:
+            entry = self.repeats.get(key)
+            if entry is None or now - entry[1] >= self.period:
+                self.repeats.pop(key, None)
+                self.repeats[key] = [now, now, 0]
+                evict(self.repeats, self.max_keys)
+                return True
+            entry[1] = now
+            entry[2] += 1
+            if now - entry[0] < self.period:
+                return False
+            started, count = entry[0], entry[2]
+            entry[0], entry[2] = now, 0
+        record.msg = LOG_REPEATED.format(
+            message=record.getMessage(), count=count,
+            seconds=round(now - started)
+        )
+        record.args = None
+        record.exc_info = record.exc_text = None
+        return True
+
+    def sweep(self):
+        """Раз в period секунд забудет отпечатки, не встречавшиеся за период.
+        Счетчики выборки DEBUG при этом сбрасываются.
+        """
+        now = self.clock()
+        with self.lock:
+            if now - self.swept < self.period:
+                return
+            self.swept = now
+            self.samples.clear()
+            for key in [key for key, entry in self.repeats.items()
+                        if now - entry[1] >= self.period]:
+                del self.repeats[key]
+
+
+def evict(entries, max_keys):
+    """Удалит из словаря entries самые старые ключи сверх max_keys."""
+    while len(entries) > max_keys:
+        del entries[next(iter(entries))]
+
+
+def fingerprint(record):
+    """Вернет отпечаток записи журнала для группировки повторов."""
+    if record.exc_info and record.exc_info[1] is not None:
+        error, traceback = record.exc_info[1], record.exc_info[2]
+        while traceback is not None and traceback.tb_next is not None:
+            traceback = traceback.tb_next
+        location = None if traceback is None else (
+            traceback.tb_frame.f_code.co_filename, traceback.tb_lineno
+        )
+        return record.name, type(error).__name__, location
+    return record.name, record.levelno, str(
+        getattr(record, 'template', record.msg)
+    )
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись журнала как одну строку JSON."""
+
+    def format(self, record):
+        """Вернет запись в виде строки JSON."""
+        data = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'line': record.lineno,
+            'message': record.getMessage(),
+            'tenant': getattr(record, 'tenant', None),
+            'iteration': getattr(record, 'iteration', None),
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class FastQueueHandler(logging.handlers.QueueHandler):
+    """Кладет запись в очередь без форматирования.
+    Форматирование, включая трассировку исключения, выполняется
+    в потоке QueueListener.
+    """
+
+    def prepare(self, record):
+        """Вернет запись без изменений."""
+        return record
+
+
+class QueueListener(logging.handlers.QueueListener):
+    """QueueListener, который можно останавливать повторно."""
+
+    def stop(self):
+        """Дождется вывода записей из очереди и остановит поток."""
+        if self._thread is not None:
+            super().stop()
+
+
+@contextmanager
+def log_context(tenant=None, iteration=None):
+    """Задаст студента и номер итерации для записей журнала в блоке."""
+    tenant_token = TENANT.set(tenant)
+    iteration_token = ITERATION.set(iteration)
+    try:
+        yield
+    finally:
+        TENANT.reset(tenant_token)
+        ITERATION.reset(iteration_token)
+
+
+def configure_logging(filename, level=LOG_LEVEL):
+    """Настроит журнал с выводом через очередь.
+    Запись в stdout и в файл с ротацией выполняет фоновый поток,
+    поэтому вызов логгера в цикле опроса только кладет запись в очередь.
+    Повторяющиеся записи прореживаются фильтром DedupFilter.
+    Вернет запущенный QueueListener.
+    """
+    formatter = JsonFormatter()
+    handlers = [
+        logging.StreamHandler(stream=sys.stdout),
+        logging.handlers.RotatingFileHandler(
+            filename=filename,
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT
+        ),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    records = queue.SimpleQueue()
+    queue_handler = FastQueueHandler(records)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(DedupFilter())
+    logging.basicConfig(level=level, handlers=[queue_handler], force=True)
+    listener = QueueListener(
+        records, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,317 @@
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import os
+import threading
+import time
+
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = os.getenv('METRICS_PORT')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30)
+LAG_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+METRICS_STARTED = 'Метрики доступны по адресу http://{host}:{port}/metrics'
+
+
+logger = logging.getLogger(__name__)
+
+
+class Metric:
+    """Метрика с набором меток.
+    Значения для каждого сочетания меток хранятся отдельно
+    и изменяются под собственной блокировкой, поэтому потоки,
+    обновляющие разные сочетания, не мешают друг другу.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def child(self, labels):
+        """Вернет значения метрики для сочетания меток labels."""
+        child = self.children.get(labels)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(labels, self.new_child())
+        return child
+
+    def new_child(self):
+        """Создаст значения метрики для нового сочетания меток."""
+        raise NotImplementedError
+
+    def format_labels(self, labels, extra=()):
+        """Вернет метки в формате Prometheus."""
+        pairs = list(zip(self.labelnames, labels)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(
+            '{}="{}"'.format(name, escape(value)) for name, value in pairs
+        ) + '}'
+
+    def render(self):
+        """Вернет строки метрики в текстовом формате Prometheus."""
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        for labels, child in sorted(list(self.children.items())):
+            lines.extend(self.render_child(labels, child))
+        return lines
+
+
+class Counter(Metric):
+    """Счетчик событий."""
+
+    kind = 'counter'
+
+    def new_child(self):
+        """Создаст значение счетчика для нового сочетания меток."""
+        return CounterValue()
+
+    def inc(self, *labels, amount=1):
+        """Увеличит счетчик для меток labels."""
+        child = self.child(labels)
+        with child.lock:
+            child.value += amount
+
+    def value(self, *labels):
+        """Вернет значение счетчика для меток labels."""
+        return self.child(labels).value
+
+    def render_child(self, labels, child):
+        """Вернет строку счетчика для меток labels."""
+        return [
+            f'{self.name}_total{self.format_labels(labels)} {child.value}'
+        ]
+
+
+class CounterValue:
+    """Значение счетчика для одного сочетания меток."""
+
+    __slots__ = ('lock', 'value')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+
+class Gauge(Metric):
+    """Текущее значение величины."""
+
+    kind = 'gauge'
+
+    def new_child(self):
+        """Создаст значение для нового сочетания меток."""
+        return CounterValue()
+
+    def set(self, value, *labels):
+        """Установит значение для меток labels."""
+        child = self.child(labels)
+        with child.lock:
+            child.value = value
+
+    def value(self, *labels):
+        """Вернет значение для меток labels."""
+        return self.child(labels).value
+
+    def render_child(self, labels, child):
+        """Вернет строку значения для меток labels."""
+        return [f'{self.name}{self.format_labels(labels)} {child.value}']
+
+
+class Histogram(Metric):
+    """Гистограмма длительностей."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def new_child(self):
+        """Создаст значения гистограммы для нового сочетания меток."""
+        return HistogramValues(len(self.buckets))
+
+    def observe(self, seconds, *labels):
+        """Учтет наблюдение длительностью seconds для меток labels."""
+        child = self.child(labels)
+        index = bisect_left(self.buckets, seconds)
+        with child.lock:
+            child.counts[index] += 1
+            child.sum += seconds
+
+    def count(self, *labels):
+        """Вернет число наблюдений для меток labels."""
+        return sum(self.child(labels).counts)
+
+    def render_child(self, labels, child):
+        """Вернет строки гистограммы для меток labels."""
+        with child.lock:
+            counts, total = list(child.counts), child.sum
+        lines = []
+        cumulative = 0
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            lines.append('{}_bucket{} {}'.format(
+                self.name, self.format_labels(labels, [('le', bound)]),
+                cumulative
+            ))
+        labels_text = self.format_labels(labels)
+        lines.append(f'{self.name}_sum{labels_text} {total}')
+        lines.append(f'{self.name}_count{labels_text} {cumulative}')
+        return lines
+
+
+class HistogramValues:
+    """Значения гистограммы для одного сочетания меток."""
+
+    __slots__ = ('lock', 'counts', 'sum')
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.counts = [0] * (size + 1)
+        self.sum = 0.0
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """Добавит метрику в набор и вернет ее."""
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Вернет все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    """Экранирует значение метки."""
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n'
+    )
+
+
+REGISTRY = Registry()
+API_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'homework_api_request_seconds',
+    'Длительность запроса к API Практикум.Домашка по результату.',
+    ('outcome',)
+))
+API_RETRIES = REGISTRY.register(Counter(
+    'homework_api_retries',
+    'Число повторов запроса к API Практикум.Домашка по причине.',
+    ('reason',)
+))
+TELEGRAM_SEND_SECONDS = REGISTRY.register(Histogram(
+    'telegram_send_seconds',
+    'Длительность отправки сообщения в Телеграм.',
+    ('outcome',)
+))
+TELEGRAM_SEND_FAILURES = REGISTRY.register(Counter(
+    'telegram_send_failures',
+    'Число неудачных отправок сообщений в Телеграм.'
+))
+POLL_SECONDS = REGISTRY.register(Histogram(
+    'poll_iteration_seconds',
+    'Длительность одной итерации опроса API для студента.'
+))
+POLL_DEADLINE_OVERRUNS = REGISTRY.register(Counter(
+    'poll_deadline_overruns',
+    'Число итераций опроса, не уложившихся в срок.'
+))
+SCHEDULE_LAG_SECONDS = REGISTRY.register(Histogram(
+    'poll_schedule_lag_seconds',
+    'Опоздание начала опроса относительно расписания.',
+    buckets=LAG_BUCKETS
+))
+CIRCUIT_STATE = REGISTRY.register(Gauge(
+    'circuit_breaker_state',
+    'Состояние предохранителя: 0 - закрыт, 1 - полуоткрыт, 2 - открыт.',
+    ('dependency',)
+))
+CIRCUIT_REJECTED = REGISTRY.register(Counter(
+    'circuit_breaker_rejected',
+    'Число вызовов, пропущенных открытым предохранителем.',
+    ('dependency',)
+))
+LEASES_HELD = REGISTRY.register(Gauge(
+    'leases_held',
+    'Число студентов, которыми владеет этот экземпляр бота.'
+))
+LEASE_TAKEOVERS = REGISTRY.register(Counter(
+    'lease_takeovers',
+    'Число студентов, перешедших от другого экземпляра бота.'
+))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдает метрики по адресу /metrics."""
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        """Отдаст текущие значения метрик."""
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Отключит журнал запросов к серверу метрик."""
+
+
+def timed(histogram, outcomes=()):
+    """Декоратор, учитывающий длительность вызова в histogram.
+    Меткой outcome служит ok, имя исключения из outcomes или error.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            outcome = 'ok'
+            try:
+                return func(*args, **kwargs)
+            except outcomes as error:
+                outcome = type(error).__name__
+                raise
+            except Exception:
+                outcome = 'error'
+                raise
+            finally:
+                histogram.observe(time.monotonic() - started, outcome)
+        return wrapper
+    return decorator
+
+
+def start_http_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Запустит HTTP-сервер метрик в фоновом потоке.
+    Если порт не задан, сервер не запускается.
+    """
+    if port is None:
+        return None
+    server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(METRICS_STARTED.format(host=host, port=server.server_port))
+    return server
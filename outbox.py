@@ -0,0 +1,477 @@
+from contextlib import closing
+from http import HTTPStatus
+import heapq
+import itertools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+from metrics import TELEGRAM_SEND_FAILURES, TELEGRAM_SEND_SECONDS
+from retry import RetryPolicy
+
+
+GLOBAL_RATE = 30
+GLOBAL_BURST = 30
+CHAT_RATE = 1
+CHAT_BURST = 3
+SENDERS = int(os.getenv('SENDERS', 4))
+DEFAULT_RETRY_AFTER = 1
+BREAKER_RECHECK = 1
+SEND_TIMEOUT = 10
+SEND_ATTEMPTS = int(os.getenv('SEND_ATTEMPTS', 10))
+SEND_RETRY_BASE_DELAY = 1
+SEND_RETRY_MAX_DELAY = 300
+JOURNAL_SCHEMA = ('CREATE TABLE IF NOT EXISTS {table} ('
+                  'id INTEGER PRIMARY KEY, chat_id TEXT NOT NULL, '
+                  'message TEXT NOT NULL)')
+JOURNAL_INSERT = 'INSERT INTO {table} (chat_id, message) VALUES (?, ?)'
+JOURNAL_DELETE = 'DELETE FROM {table} WHERE id = ?'
+JOURNAL_SELECT = 'SELECT id, chat_id, message FROM {table} ORDER BY id'
+
+FAILED_SENDING = ('При отправке сообщения "{message}" возникла следующая '
+                  'ошибка: {error}.')
+SUCCESSFUL_SENDING = 'Успешная отправка сообщения: "{message}".'
+SENDING_POSTPONED = ('Сообщение "{message}" не отправлено: {error}. '
+                     'Повтор через {delay:.0f} с.')
+MESSAGES_NOT_SENT = 'При остановке не отправлено сообщений: {count}.'
+MESSAGES_RECOVERED = 'Из журнала {path} восстановлено сообщений: {count}.'
+MESSAGES_MOVED = 'Из журнала {source} в {path} перенесено сообщений: {count}.'
+JOURNAL_ERROR = 'Ошибка журнала сообщений {path}: {error}.'
+TOO_MANY_REQUESTS = ('Телеграм ограничил частоту отправки сообщений, '
+                     'повтор через {retry_after} с.')
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ограничитель частоты событий.
+    Разрешает не более rate событий в секунду и не более burst подряд.
+    """
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def reserve(self, now):
+        """Займет одно событие и вернет момент, когда его можно выполнить."""
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return now
+        return now - self.tokens / self.rate
+
+
+class OutgoingMessage:
+    """Сообщение в очереди на отправку.
+    key - номер сообщения в журнале, attempts - число неудачных попыток.
+    """
+
+    __slots__ = ('chat_id', 'text', 'enqueued', 'key', 'attempts')
+
+    def __init__(self, chat_id, text, enqueued, key=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.enqueued = enqueued
+        self.key = key
+        self.attempts = 0
+
+
+class MessageJournal:
+    """Журнал неотправленных сообщений в базе SQLite.
+    Сообщение записывается в журнал до постановки в очередь
+    и удаляется после доставки или отказа Телеграм, поэтому
+    сообщения, не отправленные до остановки бота, отправляются
+    после перезапуска. Разные журналы одной базы хранятся
+    в разных таблицах table.
+    """
+
+    def __init__(self, path, table='outbox'):
+        self.path = path
+        self.table = table
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute(JOURNAL_SCHEMA.format(table=table))
+
+    def add(self, chat_id, message):
+        """Запишет сообщение в журнал и вернет его номер."""
+        with self.lock:
+            return self.connection.execute(
+                JOURNAL_INSERT.format(table=self.table),
+                (str(chat_id), message)
+            ).lastrowid
+
+    def remove(self, key):
+        """Удалит из журнала сообщение с номером key."""
+        try:
+            with self.lock:
+                self.connection.execute(
+                    JOURNAL_DELETE.format(table=self.table), (key,)
+                )
+        except sqlite3.Error as error:
+            logger.error(
+                JOURNAL_ERROR.format(path=self.path, error=error),
+                extra={'template': JOURNAL_ERROR}
+            )
+
+    def pending(self, chat_ids=None):
+        """Вернет неотправленные сообщения в порядке записи.
+        Если задан chat_ids, вернет только сообщения этих чатов.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                JOURNAL_SELECT.format(table=self.table)
+            ).fetchall()
+        if chat_ids is None:
+            return rows
+        chat_ids = {str(chat_id) for chat_id in chat_ids}
+        return [row for row in rows if row[1] in chat_ids]
+
+    def merge(self, paths, chat_ids):
+        """Перенесет в журнал сообщения чатов chat_ids из журналов paths.
+        Нужно, когда чат перешел из раздела другого процесса после
+        изменения их числа: журнал старого раздела больше никто не читает.
+        Сообщения удаляются из старого журнала после записи в этот,
+        поэтому сбой между записью и удалением приведет к повторной
+        отправке, но не к потере.
+        """
+        chat_ids = {str(chat_id) for chat_id in chat_ids}
+        for path in paths:
+            if path == self.path or not os.path.exists(path):
+                continue
+            with closing(sqlite3.connect(path)) as source, source:
+                source.execute(JOURNAL_SCHEMA.format(table=self.table))
+                rows = [
+                    row for row in source.execute(
+                        JOURNAL_SELECT.format(table=self.table)
+                    ) if row[1] in chat_ids
+                ]
+                for _, chat_id, message in rows:
+                    self.add(chat_id, message)
+                source.executemany(
+                    JOURNAL_DELETE.format(table=self.table),
+                    [(key,) for key, _, _ in rows]
+                )
+            if rows:
+                logger.info(MESSAGES_MOVED.format(
+                    source=path, path=self.path, count=len(rows)
+                ))
+
+
+class TelegramOutbox:
+    """Очередь исходящих сообщений в Телеграм.
+    Сообщения отправляются фоновыми потоками с соблюдением общего
+    ограничения частоты и ограничения для каждого чата, поэтому
+    опрос API не ждет доставки сообщений.
+    Пока предохранитель breaker открыт, сообщения остаются в очереди.
+    Сбои сети и ошибки сервера Телеграм повторяются по правилам retry.
+    В каждый чат одновременно отправляется не более одного сообщения:
+    пока сообщение ждет повтора, следующие сообщения чата придерживаются
+    и затем отправляются по одному с соблюдением ограничения чата,
+    поэтому порядок сообщений в чате сохраняется.
+    Если задан журнал journal, сообщение считается принятым только
+    после записи в него.
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE,
+                 senders=SENDERS, breaker=None, journal=None, retry=None):
+        now = time.monotonic()
+        self.bot = bot
+        self.breaker = breaker
+        self.journal = journal
+        self.retry = retry or RetryPolicy(
+            SEND_ATTEMPTS, SEND_RETRY_BASE_DELAY, SEND_RETRY_MAX_DELAY,
+            budget=math.inf
+        )
+        self.chat_rate = chat_rate
+        self.global_bucket = TokenBucket(global_rate, GLOBAL_BURST, now)
+        self.chat_buckets = {}
+        self.queue = []
+        self.active = {}
+        self.held = {}
+        self.sequence = itertools.count()
+        lock = threading.RLock()
+        self.condition = threading.Condition(lock)
+        self.drained = threading.Condition(lock)
+        self.delivering = 0
+        self.stopping = False
+        self.paused_until = now
+        self.senders = senders
+        self.sent = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def start(self, chat_ids=None):
+        """Запустит фоновые потоки отправки сообщений.
+        Сообщения, оставшиеся в журнале, снова ставятся в очередь.
+        Если задан chat_ids, ставятся только сообщения этих чатов:
+        сообщения чатов, перешедших в другой раздел, заберет и отправит
+        процесс этого раздела.
+        """
+        if self.journal is not None:
+            pending = self.journal.pending(chat_ids)
+            for key, chat_id, message in pending:
+                self.enqueue(OutgoingMessage(
+                    chat_id, message, time.monotonic(), key
+                ))
+            if pending:
+                logger.info(MESSAGES_RECOVERED.format(
+                    path=self.journal.path, count=len(pending)
+                ))
+        for _ in range(self.senders):
+            threading.Thread(target=self.work, daemon=True).start()
+        return self
+
+    def send(self, chat_id, message):
+        """Поставит сообщение в очередь на отправку в чат chat_id.
+        Вернет False, если сообщение не удалось записать в журнал.
+        """
+        key = None
+        if self.journal is not None:
+            try:
+                key = self.journal.add(chat_id, message)
+            except sqlite3.Error as error:
+                logger.error(JOURNAL_ERROR.format(
+                    path=self.journal.path, error=error
+                ), extra={'template': JOURNAL_ERROR})
+                return False
+        self.enqueue(OutgoingMessage(chat_id, message, time.monotonic(), key))
+        return True
+
+    def enqueue(self, outgoing):
+        """Поставит сообщение в очередь с учетом ограничения чата."""
+        with self.condition:
+            now = time.monotonic()
+            bucket = self.chat_buckets.get(outgoing.chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_rate, CHAT_BURST, now)
+                self.chat_buckets[outgoing.chat_id] = bucket
+            self.push(bucket.reserve(now), outgoing)
+
+    def push(self, ready, outgoing):
+        """Добавит сообщение в очередь. Вызывается под self.condition."""
+        heapq.heappush(self.queue, (ready, next(self.sequence), outgoing))
+        self.condition.notify()
+
+    def take(self):
+        """Дождется сообщения, которое пора отправлять.
+        Вернет момент отправки с учетом общего ограничения и само сообщение
+        или None после остановки очереди.
+        """
+        with self.condition:
+            while not self.stopping:
+                now = time.monotonic()
+                if self.queue and self.queue[0][0] <= now:
+                    _, _, outgoing = heapq.heappop(self.queue)
+                    owner = self.active.get(outgoing.chat_id)
+                    if owner is not None and owner is not outgoing:
+                        self.held.setdefault(
+                            outgoing.chat_id, []
+                        ).append(outgoing)
+                        continue
+                    self.active[outgoing.chat_id] = outgoing
+                    self.delivering += 1
+                    ready = max(
+                        self.global_bucket.reserve(now), self.paused_until
+                    )
+                    return ready, outgoing
+                self.condition.wait(
+                    self.queue[0][0] - now if self.queue else None
+                )
+        return None
+
+    def work(self):
+        """Цикл фонового потока отправки."""
+        while True:
+            taken = self.take()
+            if taken is None:
+                return
+            ready, outgoing = taken
+            delay = ready - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                if self.breaker is None or self.breaker.allow():
+                    self.deliver(outgoing)
+                else:
+                    with self.condition:
+                        self.push(max(
+                            self.breaker.retry_at,
+                            time.monotonic() + BREAKER_RECHECK
+                        ), outgoing)
+            finally:
+                with self.condition:
+                    self.delivering -= 1
+                    if not self.queue and not self.delivering:
+                        self.drained.notify_all()
+
+    def deliver(self, outgoing):
+        """Отправит сообщение в его чат.
+        При ответе 429 отправка всех сообщений приостанавливается
+        на retry_after секунд, а сообщение возвращается в очередь.
+        После сбоя сети или ошибки сервера отправка повторяется,
+        после отказа Телеграм с кодом 4xx сообщение отбрасывается.
+        """
+        started = time.monotonic()
+        try:
+            self.bot.send_message(
+                outgoing.chat_id, outgoing.text, timeout=SEND_TIMEOUT
+            )
+        except ApiTelegramException as error:
+            TELEGRAM_SEND_SECONDS.observe(time.monotonic() - started, 'error')
+            self.record(
+                error.error_code < HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+            if error.error_code == HTTPStatus.TOO_MANY_REQUESTS:
+                self.retry_later(outgoing, error)
+            elif error.error_code < HTTPStatus.INTERNAL_SERVER_ERROR:
+                self.fail(outgoing, error)
+            else:
+                self.postpone(outgoing, error)
+            return
+        except Exception as error:
+            TELEGRAM_SEND_SECONDS.observe(time.monotonic() - started, 'error')
+            self.record(False)
+            self.postpone(outgoing, error)
+            return
+        TELEGRAM_SEND_SECONDS.observe(time.monotonic() - started, 'ok')
+        self.record(True)
+        self.forget(outgoing)
+        latency = time.monotonic() - outgoing.enqueued
+        with self.condition:
+            self.sent += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+        logger.debug(
+            SUCCESSFUL_SENDING.format(message=outgoing.text),
+            extra={'template': SUCCESSFUL_SENDING}
+        )
+
+    def record(self, available):
+        """Сообщит предохранителю, ответил ли Телеграм без сбоя."""
+        if self.breaker is None:
+            return
+        if available:
+            self.breaker.success()
+        else:
+            self.breaker.failure()
+
+    def retry_later(self, outgoing, error):
+        """Вернет сообщение в очередь после ответа 429."""
+        retry_after = error.result_json.get('parameters', {}).get(
+            'retry_after', DEFAULT_RETRY_AFTER
+        )
+        logger.warning(
+            TOO_MANY_REQUESTS.format(retry_after=retry_after),
+            extra={'template': TOO_MANY_REQUESTS}
+        )
+        with self.condition:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + retry_after)
+            self.push(now, outgoing)
+
+    def postpone(self, outgoing, error):
+        """Вернет сообщение в очередь после временного сбоя.
+        Если попытки исчерпаны, сообщение отбрасывается.
+        """
+        outgoing.attempts += 1
+        delay = self.retry.delay(
+            outgoing.attempts, time.monotonic() - outgoing.enqueued
+        )
+        if delay is None:
+            self.fail(outgoing, error)
+            return
+        logger.warning(SENDING_POSTPONED.format(
+            message=outgoing.text, error=error, delay=delay
+        ), extra={'template': SENDING_POSTPONED})
+        with self.condition:
+            self.push(time.monotonic() + delay, outgoing)
+
+    def fail(self, outgoing, error):
+        """Учтет, залогирует и отбросит неотправленное сообщение."""
+        TELEGRAM_SEND_FAILURES.inc()
+        self.forget(outgoing)
+        with self.condition:
+            self.failed += 1
+        logger.error(
+            FAILED_SENDING.format(message=outgoing.text, error=error),
+            exc_info=True
+        )
+
+    def forget(self, outgoing):
+        """Удалит обработанное сообщение из журнала.
+        Чат переходит к первому придержанному сообщению, и оно
+        возвращается в очередь. Время отправки занимается заново
+        по ограничению чата: пока первое сообщение ждало повтора,
+        места, занятые при постановке, остались в прошлом.
+        """
+        if self.journal is not None and outgoing.key is not None:
+            self.journal.remove(outgoing.key)
+        chat_id = outgoing.chat_id
+        with self.condition:
+            if self.active.get(chat_id) is not outgoing:
+                return
+            held = self.held.get(chat_id)
+            if not held:
+                del self.active[chat_id]
+                self.held.pop(chat_id, None)
+                return
+            following = self.active[chat_id] = held.pop(0)
+            self.push(
+                self.chat_buckets[chat_id].reserve(time.monotonic()),
+                following
+            )
+
+    def backlog(self):
+        """Вернет число неотправленных сообщений в очереди.
+        Вызывается под self.condition.
+        """
+        return len(self.queue) + sum(map(len, self.held.values()))
+
+    def close(self, timeout):
+        """Дождется отправки всех сообщений из очереди и остановит потоки.
+        Вернет False, если за timeout секунд очередь не опустела.
+        Сообщения из журнала будут отправлены после перезапуска.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            try:
+                while self.queue or self.delivering:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logger.warning(MESSAGES_NOT_SENT.format(
+                            count=self.backlog() + self.delivering
+                        ), extra={'template': MESSAGES_NOT_SENT})
+                        return False
+                    self.drained.wait(remaining)
+                return True
+            finally:
+                self.stopping = True
+                self.condition.notify_all()
+
+    def stats(self):
+        """Вернет длину очереди и задержку доставки сообщений."""
+        with self.condition:
+            return {
+                'queued': self.backlog(),
+                'sent': self.sent,
+                'failed': self.failed,
+                'latency_avg': self.latency_total / max(self.sent, 1),
+                'latency_max': self.latency_max,
+            }
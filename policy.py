@@ -0,0 +1,79 @@
+import random
+
+from exceptions import CircuitOpenError, DeadlineExceeded, ServerError
+from homework import RETRY_PERIOD
+from records import HomeworkStatus
+
+
+# Периоды подобраны моделированием (simulation.py): с ними запросов
+# к API меньше, чем при опросе раз в RETRY_PERIOD, медианная задержка
+# уведомления ниже, а наибольшая ограничена IDLE_PERIOD с разбросом.
+REVIEWING_PERIOD = 540
+IDLE_PERIOD = 630
+IDLE_FACTOR = 1.5
+ERROR_PERIOD = 30
+ERROR_PERIOD_LIMIT = 1800
+JITTER = 0.05
+
+TRANSIENT_ERRORS = (ServerError, ConnectionError, CircuitOpenError,
+                    DeadlineExceeded)
+
+
+class PollingPolicy:
+    """Выбирает время следующего опроса API по состоянию студента.
+    Пока работа на проверке, API опрашивается чаще. При сбоях сети
+    и сервера задержка растет экспоненциально, а при отсутствии
+    изменений постепенно увеличивается до idle_period.
+    Случайные составляющие задержек берутся из rng.
+    """
+
+    def __init__(self, retry_period=RETRY_PERIOD,
+                 reviewing_period=REVIEWING_PERIOD, idle_period=IDLE_PERIOD,
+                 idle_factor=IDLE_FACTOR, error_period=ERROR_PERIOD,
+                 error_period_limit=ERROR_PERIOD_LIMIT, jitter=JITTER,
+                 rng=random):
+        self.retry_period = retry_period
+        self.reviewing_period = reviewing_period
+        self.idle_period = idle_period
+        self.idle_factor = idle_factor
+        self.error_period = error_period
+        self.error_period_limit = error_period_limit
+        self.jitter = jitter
+        self.rng = rng
+
+    def next_delay(self, tenant, homeworks, error):
+        """Вернет число секунд до следующего опроса.
+        Состояние студента обновляется по результату опроса.
+        """
+        if error is not None:
+            return self.error_delay(tenant, error)
+        tenant.failures = 0
+        reviewing = HomeworkStatus.REVIEWING in tenant.statuses.values()
+        if homeworks:
+            tenant.idle_delay = self.retry_period
+        elif not reviewing:
+            tenant.idle_delay = min(
+                max(tenant.idle_delay, self.retry_period) * self.idle_factor,
+                self.idle_period
+            )
+        if reviewing:
+            return self.spread(self.reviewing_period)
+        return self.spread(max(tenant.idle_delay, self.retry_period))
+
+    def error_delay(self, tenant, error):
+        """Вернет задержку после ошибки опроса.
+        Для временных сбоев используется экспоненциальная задержка
+        со случайной составляющей.
+        """
+        if not isinstance(error, TRANSIENT_ERRORS):
+            return self.spread(self.retry_period)
+        tenant.failures += 1
+        delay = min(self.error_period * 2 ** (tenant.failures - 1),
+                    self.error_period_limit)
+        return delay / 2 + self.rng.uniform(0, delay / 2)
+
+    def spread(self, delay):
+        """Случайно сдвинет задержку на долю jitter.
+        Так опросы разных студентов не собираются в одно время.
+        """
+        return delay * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+from enum import Enum
+
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+KEY_NOT_FOUND_IN_HOMEWORK = ('Ожидаемый ключ {key} отсутствует '
+                             'в данных о домашней работе.')
+WRONG_HOMEWORK_STATUS = ('Неожиданный статус домашней работы "{status}", '
+                         'обнаруженный в ответе API.')
+WRONG_DATE_FORMAT = ('Неожиданный формат даты "{date}" '
+                     'в данных о домашней работе.')
+
+
+class HomeworkStatus(str, Enum):
+    """Статус проверки домашней работы."""
+
+    APPROVED = 'approved'
+    REVIEWING = 'reviewing'
+    REJECTED = 'rejected'
+
+    def __str__(self):
+        return self.value
+
+
+STATUSES = {status.value: status for status in HomeworkStatus}
+
+
+class Homework:
+    """Запись о домашней работе.
+    Хранит только поля, нужные боту: статус - общий для всех записей
+    элемент HomeworkStatus, дата изменения - целое число секунд.
+    """
+
+    __slots__ = ('id', 'homework_name', 'status', 'date_updated')
+
+    def __init__(self, id, homework_name, status, date_updated=None):
+        self.id = id
+        self.homework_name = homework_name
+        self.status = status
+        self.date_updated = date_updated
+
+    def __eq__(self, other):
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name)
+                   for name in self.__slots__)
+
+    def __repr__(self):
+        return (f'Homework(id={self.id!r}, '
+                f'homework_name={self.homework_name!r}, '
+                f'status={self.status.value!r}, '
+                f'date_updated={self.date_updated!r})')
+
+    @property
+    def key(self):
+        """Ключ работы в индексе статусов."""
+        return self.homework_name if self.id is None else self.id
+
+    @classmethod
+    def from_dict(cls, data):
+        """Проверит данные о работе из ответа API и вернет запись.
+        Каждое поле читается из словаря один раз.
+        """
+        homework_name = data.get('homework_name')
+        if homework_name is None:
+            raise KeyError(
+                KEY_NOT_FOUND_IN_HOMEWORK.format(key='homework_name')
+            )
+        raw_status = data.get('status')
+        status = STATUSES.get(raw_status)
+        if status is None:
+            if raw_status is None:
+                raise KeyError(KEY_NOT_FOUND_IN_HOMEWORK.format(key='status'))
+            raise ValueError(WRONG_HOMEWORK_STATUS.format(status=raw_status))
+        return cls(
+            data.get('id'), homework_name, status,
+            parse_date(data.get('date_updated'))
+        )
+
+
+def parse_date(value):
+    """Переведет дату из ответа API в число секунд с начала эпохи."""
+    if value is None:
+        return None
+    try:
+        return int(datetime.strptime(value, DATE_FORMAT).replace(
+            tzinfo=timezone.utc
+        ).timestamp())
+    except (TypeError, ValueError):
+        raise ValueError(WRONG_DATE_FORMAT.format(date=value))
@@ -0,0 +1,59 @@
+from http import HTTPStatus
+import os
+import random
+
+
+RETRY_ATTEMPTS = int(os.getenv('RETRY_ATTEMPTS', 3))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 4
+RETRY_BUDGET = float(os.getenv('RETRY_BUDGET', 10))
+RETRY_STATUSES = frozenset((
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+))
+
+
+class RetryPolicy:
+    """Правила повтора запроса в пределах одного опроса.
+    Делается не более attempts попыток. Задержка перед повтором
+    выбирается случайно от нуля до base_delay * 2 ** (номер попытки - 1),
+    но не больше max_delay. Повторы прекращаются, если с начала
+    первой попытки прошло бы больше budget секунд.
+    """
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY, budget=RETRY_BUDGET,
+                 rng=random):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.rng = rng
+
+    def delay(self, attempt, elapsed, retry_after=None):
+        """Вернет задержку перед попыткой номер attempt + 1.
+        elapsed - время с начала первой попытки, retry_after - задержка,
+        которую просит сервер. Вернет None, если повторять не нужно.
+        """
+        if attempt >= self.attempts:
+            return None
+        if retry_after is None:
+            delay = self.rng.uniform(0, min(
+                self.max_delay, self.base_delay * 2 ** (attempt - 1)
+            ))
+        else:
+            delay = retry_after
+        if elapsed + delay > self.budget:
+            return None
+        return delay
+
+
+def retry_after(response):
+    """Вернет задержку из заголовка Retry-After в секундах или None."""
+    value = response.headers.get('Retry-After')
+    if value is None or not value.strip().isdigit():
+        return None
+    return int(value)
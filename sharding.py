@@ -0,0 +1,67 @@
+from bisect import bisect
+import glob
+import hashlib
+
+
+RING_REPLICAS = 64
+PARTITION_SUFFIX = '.shard{shard}'
+
+
+class HashRing:
+    """Согласованное хеширование студентов по процессам.
+    Каждый процесс занимает replicas точек на кольце, студент
+    достается процессу, чья точка следует за хешем его ключа.
+    При изменении числа процессов переходит лишь доля студентов,
+    остальные сохраняют свой процесс и раздел состояния.
+    """
+
+    def __init__(self, shards, replicas=RING_REPLICAS):
+        self.shards = shards
+        points = sorted(
+            (ring_hash(f'{shard}:{replica}'), shard)
+            for shard in range(shards) for replica in range(replicas)
+        )
+        self.hashes = [point for point, _ in points]
+        self.owners = [shard for _, shard in points]
+
+    def shard_for(self, key):
+        """Вернет номер процесса для ключа key."""
+        index = bisect(self.hashes, ring_hash(str(key)))
+        return self.owners[index % len(self.owners)]
+
+
+def ring_hash(key):
+    """Вернет положение ключа на кольце."""
+    return int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+def select_shard(tenants, shard, shards):
+    """Вернет студентов, которых опрашивает процесс shard из shards."""
+    if shards == 1:
+        return list(tenants)
+    ring = HashRing(shards)
+    return [tenant for tenant in tenants
+            if ring.shard_for(tenant.chat_id) == shard]
+
+
+def partition_path(path, shard, shards):
+    """Вернет путь к файлу состояния процесса shard."""
+    if shards == 1:
+        return path
+    return path + PARTITION_SUFFIX.format(shard=shard)
+
+
+def partition_paths(path):
+    """Вернет пути ко всем существующим файлам состояния.
+    Включает файл без раздела, оставшийся от запуска в одном процессе.
+    Служебные файлы SQLite рядом с разделами (-wal, -shm) не включаются.
+    """
+    prefix = path + PARTITION_SUFFIX.format(shard='')
+    return [path] + sorted(
+        found for found in glob.glob(
+            glob.escape(path) + PARTITION_SUFFIX.format(shard='*')
+        )
+        if found[len(prefix):].isdigit()
+    )
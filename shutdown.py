@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+import logging
+import os
+import signal
+
+from exceptions import ShutdownRequested
+
+
+SHUTDOWN_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 5))
+
+SHUTDOWN_REQUESTED = 'Получен сигнал {signal}, бот завершает работу.'
+
+
+logger = logging.getLogger(__name__)
+
+
+def handle_signals(callback, signals=SHUTDOWN_SIGNALS):
+    """Вызовет callback при получении любого из сигналов signals.
+    Вернет словарь прежних обработчиков для restore_signals.
+    """
+    def handler(signum, frame):
+        logger.info(SHUTDOWN_REQUESTED.format(
+            signal=signal.Signals(signum).name
+        ))
+        callback()
+    return {signum: signal.signal(signum, handler) for signum in signals}
+
+
+def restore_signals(previous):
+    """Вернет обработчики сигналов, замененные handle_signals."""
+    for signum, handler in previous.items():
+        signal.signal(signum, handler)
+
+
+class ShutdownFlag:
+    """Запрос остановки главного цикла по сигналу.
+    Сигнал, полученный во время ожидания в блоке waiting, прерывает
+    его исключением ShutdownRequested. В остальное время request только
+    запоминает запрос, и цикл останавливается перед следующим ожиданием:
+    исключение не возникнет посреди отправки сообщения или записи файла.
+    Исключение ShutdownRequested не наследует Exception,
+    поэтому обработчики ошибок цикла опроса его не перехватывают.
+    """
+
+    def __init__(self):
+        self.requested = False
+        self.sleeping = False
+
+    def request(self):
+        """Запросит остановку. Вызывается из обработчика сигнала."""
+        self.requested = True
+        if self.sleeping:
+            raise ShutdownRequested
+
+    @contextmanager
+    def waiting(self):
+        """Разрешит прервать ожидание в блоке.
+        Если остановка уже запрошена, сразу возбудит ShutdownRequested.
+        """
+        if self.requested:
+            raise ShutdownRequested
+        self.sleeping = True
+        try:
+            if self.requested:
+                raise ShutdownRequested
+            yield
+        finally:
+            self.sleeping = False
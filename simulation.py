@@ -0,0 +1,255 @@
+"""Моделирование опроса API в виртуальном времени.
+
+Запуск:
+
+    python simulation.py --days 14 --tenants 100
+
+Планировщик PollingEngine опрашивает сценарный API, время в котором
+идет по виртуальным часам, поэтому недели работы бота моделируются
+за секунды. Для каждой политики опроса выводятся число запросов
+к API, число сообщений и задержка уведомления об изменении статуса.
+"""
+from bisect import bisect_left, bisect_right
+from http import HTTPStatus
+import argparse
+import logging
+import math
+import random
+import time
+
+from clock import VirtualClock
+from engine import PollingEngine
+from homework import (HOMEWORK_STATUS_IS_CHANGED, HOMEWORK_VERDICTS,
+                      RETRY_PERIOD)
+from policy import PollingPolicy
+from records import DATE_FORMAT
+from tenants import Tenant
+
+
+START = 1_700_000_000
+DAY = 24 * 60 * 60
+SUBMIT_PERIOD = 3 * DAY
+REVIEW_PERIOD = DAY / 2
+REJECT_SHARE = 0.4
+OUTAGE_CODE = {'code': 'ServiceUnavailable',
+               'error': {'error': 'Сервис временно недоступен.'}}
+
+POLICIES = {
+    'adaptive': lambda rng: PollingPolicy(rng=rng),
+    'fixed': lambda rng: PollingPolicy(
+        reviewing_period=RETRY_PERIOD, idle_period=RETRY_PERIOD,
+        error_period=RETRY_PERIOD, error_period_limit=RETRY_PERIOD,
+        jitter=0, rng=rng
+    ),
+}
+
+REPORT_LINE = ('{policy:>9}: запросов {requests}, сообщений {messages}, '
+               'задержка уведомления p50 {latency_p50:.0f} с, '
+               'p99 {latency_p99:.0f} с, максимум {latency_max:.0f} с, '
+               'пропущено изменений {missed}; '
+               'смоделировано {days:g} сут. за {wall_seconds:.2f} с')
+
+
+class ScriptedResponse:
+    """Ответ сценарного API."""
+
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.data = data
+        self.headers = {}
+
+    def json(self):
+        """Вернет тело ответа."""
+        return self.data
+
+
+class ScriptedApi:
+    """API Практикум.Домашка, отвечающий по сценарию.
+    timeline сопоставляет токену студента список изменений
+    (момент, название работы, статус) в порядке времени,
+    outages - список интервалов (начало, конец), в которые API
+    отвечает ошибкой сервера.
+    """
+
+    def __init__(self, clock, timeline, outages=()):
+        self.clock = clock
+        self.timeline = timeline
+        self.moments = {token: [change[0] for change in changes]
+                        for token, changes in timeline.items()}
+        self.outages = list(outages)
+        self.requests_count = 0
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """Вернет работы студента, изменившиеся с момента from_date."""
+        self.requests_count += 1
+        now = self.clock.time()
+        if any(start <= now < end for start, end in self.outages):
+            return ScriptedResponse(
+                HTTPStatus.SERVICE_UNAVAILABLE, OUTAGE_CODE
+            )
+        token = headers['Authorization'].split(' ', 1)[1]
+        changes = self.timeline.get(token, [])
+        moments = self.moments.get(token, [])
+        latest = {}
+        for moment, homework_name, status in changes[
+            bisect_left(moments, params['from_date']):
+            bisect_right(moments, now)
+        ]:
+            latest[homework_name] = {
+                'homework_name': homework_name,
+                'status': status,
+                'date_updated': time.strftime(
+                    DATE_FORMAT, time.gmtime(moment)
+                ),
+            }
+        return ScriptedResponse(HTTPStatus.OK, {
+            'homeworks': list(latest.values()),
+            'current_date': int(now),
+        })
+
+
+class SimulatedBot:
+    """Бот Телеграм, запоминающий время отправки сообщений."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.messages = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        """Запомнит сообщение text для чата chat_id."""
+        self.messages.append((self.clock.time(), chat_id, text))
+
+
+class InlineExecutor:
+    """Выполняет задачи сразу в вызывающем потоке."""
+
+    def submit(self, function, *args, **kwargs):
+        """Выполнит function с аргументами args и kwargs."""
+        function(*args, **kwargs)
+
+
+def generate_timeline(tenants_count, days, rng, start=START):
+    """Сгенерирует сценарий сдачи и проверки работ для студентов."""
+    end = start + days * DAY
+    timeline = {}
+    for index in range(tenants_count):
+        changes = []
+        moment = start + rng.uniform(0, SUBMIT_PERIOD)
+        number = 0
+        while moment < end:
+            homework_name = f'student{index}__homework{number}.zip'
+            changes.append((int(moment), homework_name, 'reviewing'))
+            moment += rng.expovariate(1 / REVIEW_PERIOD)
+            if rng.random() < REJECT_SHARE:
+                changes.append((int(moment), homework_name, 'rejected'))
+                moment += rng.expovariate(1 / REVIEW_PERIOD)
+                continue
+            changes.append((int(moment), homework_name, 'approved'))
+            number += 1
+            moment += rng.expovariate(1 / SUBMIT_PERIOD)
+        timeline[f'token{index}'] = [
+            change for change in changes if change[0] < end
+        ]
+    return timeline
+
+
+def simulate(timeline, policy, days, outages=(), start=START, seed=0):
+    """Смоделирует days суток опроса API по сценарию timeline.
+    Вернет отчет с числом запросов, сообщений и задержками уведомлений.
+    """
+    clock = VirtualClock(start)
+    api = ScriptedApi(clock, timeline, outages)
+    bot = SimulatedBot(clock)
+    chats = {token: str(index) for index, token in enumerate(timeline)}
+    tenants = [Tenant(token, chat_id, start)
+               for token, chat_id in chats.items()]
+    engine = PollingEngine(
+        bot, tenants, max_workers=1, transport=api, policy=policy,
+        clock=clock, executor=InlineExecutor()
+    )
+    end = start + days * DAY
+    started = time.perf_counter()
+    while clock.monotonic() < end:
+        clock.sleep(min(engine.run_pending(), end - clock.monotonic()))
+    wall_seconds = time.perf_counter() - started
+    latencies, missed = notification_latencies(timeline, chats, bot.messages)
+    latencies.sort()
+    return {
+        'requests': api.requests_count,
+        'messages': len(bot.messages),
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p99': percentile(latencies, 0.99),
+        'latency_max': latencies[-1] if latencies else 0,
+        'missed': missed,
+        'days': days,
+        'wall_seconds': wall_seconds,
+        'seed': seed,
+    }
+
+
+def notification_latencies(timeline, chats, messages):
+    """Сопоставит изменения статусов с отправленными сообщениями.
+    Вернет список задержек уведомлений и число изменений,
+    о которых бот не сообщил до следующего изменения той же работы.
+    """
+    sent = {}
+    for moment, chat_id, text in messages:
+        sent.setdefault((chat_id, text), []).append(moment)
+    latencies = []
+    missed = 0
+    for token, changes in timeline.items():
+        following = {}
+        for moment, homework_name, status in reversed(changes):
+            superseded = following.get(homework_name, math.inf)
+            following[homework_name] = moment
+            times = sent.get((chats[token], HOMEWORK_STATUS_IS_CHANGED.format(
+                homework_name=homework_name, verdict=HOMEWORK_VERDICTS[status]
+            )), [])
+            position = bisect_left(times, moment)
+            if position < len(times) and times[position] < superseded:
+                latencies.append(times[position] - moment)
+            else:
+                missed += 1
+    return latencies, missed
+
+
+def percentile(values, share):
+    """Вернет перцентиль share отсортированного списка values."""
+    if not values:
+        return 0
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+
+def parse_args(args=None):
+    """Разберет аргументы командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=float, default=14)
+    parser.add_argument('--tenants', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', nargs='+', choices=POLICIES,
+                        default=list(POLICIES))
+    parser.add_argument('--outage', type=float, nargs=2, action='append',
+                        default=[], metavar=('НАЧАЛО', 'КОНЕЦ'),
+                        help='интервал сбоя API в часах от начала')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Смоделирует опрос для каждой политики и выведет отчеты."""
+    options = parse_args(args)
+    logging.disable(logging.CRITICAL)
+    timeline = generate_timeline(
+        options.tenants, options.days, random.Random(options.seed)
+    )
+    outages = [(START + begin * 3600, START + end * 3600)
+               for begin, end in options.outage]
+    for name in options.policy:
+        report = simulate(
+            timeline, POLICIES[name](random.Random(options.seed)),
+            options.days, outages, seed=options.seed
+        )
+        print(REPORT_LINE.format(policy=name, **report))
+
+
+if __name__ == '__main__':
+    main()
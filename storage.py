@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from records import STATUSES, Homework
+
+FLUSH_PERIOD = 5
+
+STATE_READ_ERROR = 'Не удалось прочитать состояние из {path}: {error}.'
+STATE_WRITE_ERROR = 'Не удалось сохранить состояние в {path}: {error}.'
+STATE_LOADED = 'Загружено состояние {count} студентов из {path}.'
+
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore:
+    """Хранилище состояния опроса студентов в JSON-файле.
+    Для каждого студента хранится метка current_date, с которой
+    продолжится опрос, последний доставленный статус каждой работы
+    и отметки недавно изменившихся работ.
+    Файл перезаписывается атомарно, поэтому сбой во время записи
+    не повреждает ранее сохраненное состояние.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.dirty = False
+        self.states = self.read()
+
+    def read(self):
+        """Прочитает сохраненное состояние из файла."""
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                states = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as error:
+            logger.error(
+                STATE_READ_ERROR.format(path=self.path, error=error),
+                extra={'template': STATE_READ_ERROR}
+            )
+            return {}
+        logger.debug(
+            STATE_LOADED.format(count=len(states), path=self.path),
+            extra={'template': STATE_LOADED}
+        )
+        return states
+
+    def merge(self, paths):
+        """Добавит состояния студентов из файлов paths.
+        Для каждого студента остается состояние с наибольшей меткой
+        current_date. Нужно, когда студент перешел из раздела
+        другого процесса после изменения их числа.
+        """
+        for path in paths:
+            if path == self.path:
+                continue
+            for chat_id, state in StateStore(path).states.items():
+                known = self.states.get(chat_id)
+                if known is None or (
+                        state['current_date'] > known['current_date']):
+                    self.states[chat_id] = state
+
+    def restore(self, tenant):
+        """Восстановит состояние студента, если оно было сохранено."""
+        state = self.states.get(str(tenant.chat_id))
+        if state is not None:
+            load_state(tenant, state)
+
+    def save(self, tenant):
+        """Запомнит текущее состояние студента для следующей записи."""
+        state = dump_state(tenant)
+        with self.lock:
+            if self.states.get(str(tenant.chat_id)) != state:
+                self.states[str(tenant.chat_id)] = state
+                self.dirty = True
+
+    def flush(self):
+        """Атомарно запишет изменившееся состояние в файл.
+        Записи выполняются по одной под write_lock, поэтому снимок,
+        взятый раньше, не может заменить в файле более новый.
+        Сохранение состояния студентов запись не блокирует.
+        """
+        with self.write_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                data = json.dumps(self.states, separators=(',', ':'))
+                self.dirty = False
+            try:
+                write_atomic(self.path, data)
+            except OSError as error:
+                logger.error(STATE_WRITE_ERROR.format(
+                    path=self.path, error=error
+                ), extra={'template': STATE_WRITE_ERROR})
+                with self.lock:
+                    self.dirty = True
+
+    def autoflush(self, period=FLUSH_PERIOD):
+        """Запустит фоновую запись состояния каждые period секунд."""
+        def flush_forever():
+            while True:
+                time.sleep(period)
+                self.flush()
+
+        threading.Thread(target=flush_forever, daemon=True).start()
+
+
+def dump_state(tenant):
+    """Вернет состояние опроса студента в виде словаря для JSON.
+    Названия сохраняются только для работ с известным статусом,
+    вместе с ними - последние изменения статусов для команды /history.
+    """
+    return {
+        'current_date': tenant.timestamp,
+        'statuses': [[key, status]
+                     for key, status in tenant.statuses.items()],
+        'marks': [[key, mark] for key, mark in tenant.marks.items()],
+        'names': [[key, tenant.names[key]]
+                  for key in tenant.statuses if key in tenant.names],
+        'history': [[homework.id, homework.homework_name,
+                     homework.status.value, homework.date_updated]
+                    for homework in tenant.history],
+    }
+
+
+def load_state(tenant, state):
+    """Восстановит состояние опроса студента из словаря state."""
+    tenant.timestamp = state['current_date']
+    tenant.statuses = {key: STATUSES[status]
+                       for key, status in state['statuses']
+                       if status in STATUSES}
+    tenant.marks = {key: mark for key, mark in state.get('marks', [])}
+    tenant.names = {key: name for key, name in state.get('names', [])}
+    tenant.history.clear()
+    tenant.history.extend(
+        Homework(id, homework_name, STATUSES[status], date_updated)
+        for id, homework_name, status, date_updated in state.get(
+            'history', []
+        )
+        if status in STATUSES
+    )
+
+
+def write_atomic(path, data):
+    """Запишет data в файл path через временный файл.
+    Временный файл сбрасывается на диск и переименовывается поверх
+    path, поэтому читатель видит либо старое, либо новое содержимое.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        directory_descriptor = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(directory_descriptor)
+        finally:
+            os.close(directory_descriptor)
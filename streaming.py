@@ -0,0 +1,184 @@
+from contextlib import closing
+from http import HTTPStatus
+import codecs
+import json
+
+from homework import (ENDPOINT, KEY_NOT_FOUND_IN_RESPONSE, WRONG_DATA_TYPE,
+                      WRONG_INPUT_DATA, check_api_errors, send_api_request)
+from records import Homework
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+CHUNK_SIZE = 64 * 1024
+ERROR_KEYS = ('code', 'error')
+
+UNEXPECTED_SYMBOL = 'Неожиданный символ {symbol!r} в ответе API.'
+
+
+def stream_homeworks(timestamp, headers, transport=None, extras=None):
+    """Вернет генератор записей Homework из ответа API.
+    Запрашиваются работы, изменившиеся с момента timestamp.
+    Ответ читается по частям, поэтому в памяти одновременно находится
+    одна запись, сколько бы работ ни было в истории студента.
+    Прочие поля верхнего уровня, например current_date, после разбора
+    оказываются в словаре extras.
+    """
+    request_params = {
+        'url': ENDPOINT,
+        'headers': headers,
+        'params': {'from_date': timestamp},
+        'stream': True,
+    }
+    response = send_api_request(request_params, transport)
+    with closing(response):
+        if response.status_code != HTTPStatus.OK:
+            check_api_errors(
+                response.json(), response.status_code, request_params
+            )
+        if extras is None:
+            extras = {}
+        for homework in parse_homeworks(response, extras):
+            yield Homework.from_dict(homework)
+        check_api_errors(extras, response.status_code, request_params)
+
+
+def parse_homeworks(response, extras):
+    """Вернет генератор элементов массива homeworks из тела ответа.
+    Прочие поля верхнего уровня сохраняются в extras.
+    Если установлен ijson, разбор выполняет он.
+    """
+    if ijson is not None:
+        response.raw.decode_content = True
+        return parse_with_ijson(response.raw, extras)
+    return parse_with_json(response.iter_content(CHUNK_SIZE), extras)
+
+
+def parse_with_ijson(source, extras):
+    """Разберет тело ответа с помощью ijson."""
+    state = {'found': False}
+
+    def watch(events):
+        for prefix, event, value in events:
+            if prefix == '' and event not in ('start_map', 'end_map',
+                                              'map_key'):
+                raise TypeError(WRONG_INPUT_DATA.format(data_type=event))
+            if prefix == 'homeworks' and event not in ('start_array',
+                                                       'end_array'):
+                raise TypeError(WRONG_DATA_TYPE.format(
+                    data_type=event, key='homeworks'
+                ))
+            if prefix == 'homeworks':
+                state['found'] = True
+            elif prefix in ERROR_KEYS or prefix == 'current_date':
+                extras[prefix] = value
+            yield prefix, event, value
+
+    yield from ijson.items(
+        watch(ijson.parse(source, use_float=True)), 'homeworks.item'
+    )
+    if not state['found']:
+        raise KeyError(KEY_NOT_FOUND_IN_RESPONSE.format(key='homeworks'))
+
+
+def parse_with_json(chunks, extras):
+    """Разберет тело ответа встроенным модулем json.
+    Каждый элемент массива декодируется отдельно, как только
+    он целиком оказывается в буфере.
+    """
+    stream = JsonStream(chunks)
+    if stream.peek() != '{':
+        raise TypeError(WRONG_INPUT_DATA.format(data_type=stream.peek()))
+    stream.take('{')
+    found = False
+    if stream.peek() == '}':
+        stream.take('}')
+    else:
+        while True:
+            key = stream.value()
+            stream.take(':')
+            if key == 'homeworks':
+                found = True
+                yield from stream.array('homeworks')
+            else:
+                extras[key] = stream.value()
+            if stream.take(',}') == '}':
+                break
+    if not found:
+        raise KeyError(KEY_NOT_FOUND_IN_RESPONSE.format(key='homeworks'))
+
+
+class JsonStream:
+    """Буфер для разбора JSON, поступающего частями."""
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.exhausted = False
+
+    def fill(self):
+        """Дочитает следующую часть ответа в буфер."""
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.exhausted = True
+            text = self.text_decoder.decode(b'', final=True)
+        else:
+            text = self.text_decoder.decode(chunk)
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+
+    def peek(self):
+        """Вернет следующий значащий символ или пустую строку в конце."""
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position].isspace()):
+                self.position += 1
+            if self.position < len(self.buffer) or self.exhausted:
+                return self.buffer[self.position:self.position + 1]
+            self.fill()
+
+    def take(self, symbols):
+        """Пропустит один из ожидаемых символов symbols и вернет его."""
+        symbol = self.peek()
+        if not symbol or symbol not in symbols:
+            raise ValueError(UNEXPECTED_SYMBOL.format(symbol=symbol))
+        self.position += 1
+        return symbol
+
+    def value(self):
+        """Декодирует следующее значение JSON целиком."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+                if end < len(self.buffer) or self.exhausted:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self.fill()
+
+    def array(self, key):
+        """Вернет генератор элементов массива, записанного под ключом key."""
+        if self.peek() != '[':
+            raise TypeError(WRONG_DATA_TYPE.format(
+                data_type=self.peek(), key=key
+            ))
+        self.take('[')
+        if self.peek() == ']':
+            self.take(']')
+            return
+        while True:
+            yield self.value()
+            if self.take(',]') == ']':
+                return
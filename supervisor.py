@@ -0,0 +1,147 @@
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from dotenv import load_dotenv
+
+import engine
+from logs import configure_logging
+from shutdown import SHUTDOWN_TIMEOUT, handle_signals
+
+
+load_dotenv()
+
+SHARDS = int(os.getenv('SHARDS', os.cpu_count() or 1))
+CHECK_PERIOD = 1
+RESTART_DELAY = 5
+STOP_TIMEOUT = SHUTDOWN_TIMEOUT + 1
+LOG_FILE = engine.__file__ + '.{shard}.log'
+
+SUPERVISOR_STARTED = 'Запущено процессов опроса: {shards}.'
+SHARD_DIED = 'Процесс опроса {shard} завершился с кодом {exitcode}.'
+SHARD_KILLED = 'Процесс опроса {shard} не остановился за {timeout} с.'
+SHARDS_CHANGED = 'Число процессов опроса изменилось: {old} -> {new}.'
+
+
+logger = logging.getLogger(__name__)
+
+
+class Supervisor:
+    """Запускает процессы опроса и следит за ними.
+    Студенты распределяются между shards процессами согласованным
+    хешированием, у каждого процесса свой пул соединений и свой
+    раздел состояния. Завершившийся процесс перезапускается не
+    раньше чем через restart_delay секунд после предыдущего запуска.
+    """
+
+    def __init__(self, shards, target=None, restart_delay=RESTART_DELAY,
+                 stop_timeout=STOP_TIMEOUT):
+        self.shards = shards
+        self.target = target or run_shard
+        self.restart_delay = restart_delay
+        self.stop_timeout = stop_timeout
+        self.context = multiprocessing.get_context('spawn')
+        self.processes = {}
+        self.started = {}
+        self.restarts = 0
+        self.stopping = threading.Event()
+        self.reload = threading.Event()
+
+    def start(self):
+        """Запустит процессы всех разделов."""
+        for shard in range(self.shards):
+            self.spawn(shard)
+        logger.info(SUPERVISOR_STARTED.format(shards=self.shards))
+
+    def spawn(self, shard):
+        """Запустит процесс раздела shard."""
+        process = self.context.Process(
+            target=self.target, args=(shard, self.shards),
+            name=f'shard-{shard}'
+        )
+        process.start()
+        self.processes[shard] = process
+        self.started[shard] = time.monotonic()
+
+    def check(self):
+        """Перезапустит завершившиеся процессы."""
+        for shard, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            if time.monotonic() - self.started[shard] < self.restart_delay:
+                continue
+            logger.error(SHARD_DIED.format(
+                shard=shard, exitcode=process.exitcode
+            ), extra={'template': SHARD_DIED})
+            self.restarts += 1
+            self.spawn(shard)
+
+    def stop(self):
+        """Попросит процессы завершиться и дождется их.
+        Процессы, не завершившиеся за stop_timeout секунд, убиваются.
+        """
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.stop_timeout
+        for shard, process in self.processes.items():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning(SHARD_KILLED.format(
+                    shard=shard, timeout=self.stop_timeout
+                ), extra={'template': SHARD_KILLED})
+                process.kill()
+                process.join()
+        self.processes = {}
+
+    def resize(self, shards):
+        """Перераспределит студентов между shards процессами.
+        Сначала останавливаются все процессы, чтобы ни один студент
+        не опрашивался дважды, затем запускаются новые.
+        """
+        logger.info(SHARDS_CHANGED.format(old=self.shards, new=shards))
+        self.stop()
+        self.shards = shards
+        self.start()
+
+    def run(self):
+        """Основной цикл: следит за процессами до вызова stopping.set().
+        По reload.set() перечитывает .env и при изменении SHARDS
+        перераспределяет студентов.
+        """
+        self.start()
+        while not self.stopping.wait(CHECK_PERIOD):
+            if self.reload.is_set():
+                self.reload.clear()
+                load_dotenv(override=True)
+                shards = int(os.getenv('SHARDS', self.shards))
+                if shards != self.shards:
+                    self.resize(shards)
+            self.check()
+        self.stop()
+
+
+def run_shard(shard, shards):
+    """Точка входа процесса опроса раздела shard."""
+    listener = configure_logging(LOG_FILE.format(shard=shard))
+    if not engine.main(shard, shards):
+        listener.stop()
+        os._exit(1)
+
+
+def main():
+    """Запустит SHARDS процессов опроса и будет следить за ними.
+    SIGTERM и SIGINT останавливают процессы, SIGHUP перечитывает SHARDS.
+    """
+    supervisor = Supervisor(SHARDS)
+    handle_signals(supervisor.stopping.set)
+    handle_signals(supervisor.reload.set, (signal.SIGHUP,))
+    supervisor.run()
+
+
+if __name__ == '__main__':
+    configure_logging(__file__ + '.log')
+    main()
@@ -0,0 +1,59 @@
+from collections import deque
+from contextlib import closing
+import json
+import sqlite3
+
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+TENANTS_QUERY = 'SELECT token, chat_id FROM tenants'
+HISTORY_LENGTH = 10
+
+TENANTS_NOT_FOUND = 'В реестре {path} не найдено ни одного студента.'
+
+
+class Tenant:
+    """Студент и состояние опроса API для него.
+    Хранит токен API Практикум.Домашка и идентификатор чата в Телеграм.
+    Названия работ и последние изменения статусов хранятся в памяти
+    для ответов на команды бота, даты изменения недавних работ -
+    в отметках marks для CursorManager.
+    """
+
+    __slots__ = ('token', 'chat_id', 'timestamp', 'last_message', 'statuses',
+                 'failures', 'idle_delay', 'iteration', 'names', 'history',
+                 'marks')
+
+    def __init__(self, token, chat_id, timestamp=0, last_message=None):
+        self.token = token
+        self.chat_id = chat_id
+        self.timestamp = timestamp
+        self.last_message = last_message
+        self.statuses = {}
+        self.failures = 0
+        self.idle_delay = 0
+        self.iteration = 0
+        self.names = {}
+        self.history = deque(maxlen=HISTORY_LENGTH)
+        self.marks = {}
+
+    @property
+    def headers(self):
+        """Заголовки запроса к API от имени студента."""
+        return {'Authorization': f'OAuth {self.token}'}
+
+
+def load_tenants(path, timestamp=0):
+    """Загрузит реестр студентов из JSON-файла или базы SQLite.
+    JSON-файл содержит список объектов с ключами token и chat_id,
+    база SQLite - таблицу tenants с такими же столбцами.
+    """
+    if path.endswith(SQLITE_SUFFIXES):
+        with closing(sqlite3.connect(path)) as connection:
+            rows = connection.execute(TENANTS_QUERY).fetchall()
+    else:
+        with open(path, encoding='utf-8') as file:
+            rows = [(item['token'], item['chat_id'])
+                    for item in json.load(file)]
+    if not rows:
+        raise ValueError(TENANTS_NOT_FOUND.format(path=path))
+    return [Tenant(token, chat_id, timestamp) for token, chat_id in rows]
@@ -1,3 +1,5 @@
+import io
+import json
 import logging
 import signal
 import re
@@ -116,6 +118,23 @@ class MockTelegramBot:
         self.text = text
 
 
+class StreamedResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body.encode()
+        self.status_code = status_code
+        self.raw = io.BytesIO(self.body)
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), 3):
+            yield self.body[start:start + 3]
+
+    def json(self):
+        return json.loads(self.body)
+
+    def close(self):
+        pass
+
+
 class BreakInfiniteLoop(Exception):
     pass
 
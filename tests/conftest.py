@@ -1,6 +1,8 @@
 import os
 import sys
+import tempfile
 
+import pytest
 import pytest_timeout
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -53,3 +55,12 @@ pytest_timeout.write = write_timeout_reasons
 os.environ['PRACTICUM_TOKEN'] = 'sometoken'
 os.environ['TELEGRAM_TOKEN'] = '1234:abcdefg'
 os.environ['TELEGRAM_CHAT_ID'] = '12345'
+os.environ['STATE_FILE'] = os.path.join(tempfile.mkdtemp(), 'state.json')
+
+
+@pytest.fixture(autouse=True)
+def isolated_files(tmp_path, monkeypatch):
+    """Give every test its own state file and message journal."""
+    import homework
+    monkeypatch.setattr(homework, 'STATE_FILE', str(tmp_path / 'state.json'))
+    monkeypatch.setattr(homework, 'OUTBOX_FILE', str(tmp_path / 'outbox.db'))
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from tests.check_utils import StreamedResponse
+
+
+@pytest.fixture
+def backfill_module():
+    import backfill
+    return backfill
+
+
+class HistoryApi:
+    def __init__(self, homeworks, current_date=5000, fail_tokens=()):
+        self.homeworks = homeworks
+        self.current_date = current_date
+        self.fail_tokens = fail_tokens
+        self.requests = []
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        token = headers['Authorization'].split(' ', 1)[1]
+        self.requests.append((token, params['from_date']))
+        if token in self.fail_tokens:
+            return StreamedResponse(json.dumps({
+                'code': 'UnknownError', 'error': {'error': 'Сбой'}
+            }), 500)
+        return StreamedResponse(json.dumps({
+            'homeworks': [homework for homework in self.homeworks
+                          if homework['updated'] >= params['from_date']],
+            'current_date': self.current_date,
+        }))
+
+
+def make_homework(id, status, updated):
+    return {
+        'id': id, 'homework_name': f'hw{id}.zip', 'status': status,
+        'date_updated': '2021-04-11T10:31:09Z', 'updated': updated,
+    }
+
+
+def test_backfill_stores_history_in_batches(tmp_path, backfill_module):
+    from tenants import Tenant
+    api = HistoryApi([make_homework(index, 'approved', index)
+                      for index in range(7)])
+    index = backfill_module.HistoryIndex(str(tmp_path / 'history.db'))
+    tenant = Tenant('token', 1)
+    assert backfill_module.backfill_tenant(
+        index, tenant, api, batch_size=3
+    ) == 7
+    assert api.requests == [('token', 0)]
+    assert [homework.homework_name for homework in index.history(1)] == [
+        f'hw{number}.zip' for number in range(7)
+    ]
+    assert index.resume_from(1) == 5000
+
+
+def test_backfill_resumes_after_completed_tenants(
+        tmp_path, backfill_module
+):
+    from cursor import CURSORS
+    from tenants import Tenant
+    path = str(tmp_path / 'history.db')
+    api = HistoryApi([make_homework(1, 'approved', 0)],
+                     fail_tokens={'broken'})
+    tenants = [Tenant(f'token{number}', number) for number in range(5)]
+    tenants.append(Tenant('broken', 99))
+    index = backfill_module.HistoryIndex(path)
+    summary = backfill_module.run_backfill(index, tenants, api, workers=2)
+    assert (summary['done'], summary['failed'], summary['records']) == (
+        5, 1, 5
+    )
+    index.close()
+
+    api.requests.clear()
+    index = backfill_module.HistoryIndex(path)
+    summary = backfill_module.run_backfill(index, tenants, api, workers=2)
+    assert summary['records'] == 0
+    assert sorted(api.requests) == sorted(
+        [(f'token{number}', 5000 - CURSORS.skew) for number in range(5)]
+        + [('broken', 0)]
+    )
+    assert len(index.history(0)) == 1
@@ -0,0 +1,42 @@
+import pytest
+
+
+@pytest.fixture
+def bench_module():
+    import benchmarks.run
+    return benchmarks.run
+
+
+@pytest.fixture
+def stubs_module():
+    import benchmarks.stubs
+    return benchmarks.stubs
+
+
+def test_scenario_drives_full_path(bench_module, stubs_module):
+    practicum = stubs_module.PracticumStub(error_rate=0.5, seed=1).start()
+    telegram = stubs_module.TelegramStub().start()
+    try:
+        result = bench_module.run_scenario(
+            10, practicum.url, telegram.url, workers=2
+        )
+    finally:
+        practicum.stop()
+        telegram.stop()
+    assert result['tenants'] == 10
+    assert practicum.requests_count == 10
+    assert 0 < result['errors'] < 10
+    assert telegram.requests_count == 10
+    assert result['p50_ms'] <= result['p99_ms']
+
+
+def test_compare_reports_regressions(bench_module):
+    baseline = {'100': {'throughput': 100, 'p50_ms': 10, 'p99_ms': 20,
+                        'peak_rss_kb': 1000}}
+    result = {'tenants': 100, 'throughput': 70, 'p50_ms': 11, 'p99_ms': 30,
+              'peak_rss_kb': 1000}
+    regressions = bench_module.compare([result], baseline, tolerance=0.2)
+    assert len(regressions) == 2
+    assert 'p99_ms' in regressions[0]
+    assert 'throughput' in regressions[1]
+    assert bench_module.compare([dict(result, tenants=1)], baseline) == []
@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from clock import VirtualClock
+from exceptions import CircuitOpenError
+
+
+@pytest.fixture
+def breaker_module():
+    import breaker
+    return breaker
+
+
+def test_breaker_opens_and_recovers(breaker_module):
+    clock = VirtualClock()
+    breaker = breaker_module.CircuitBreaker(
+        'test', failure_threshold=3, reset_timeout=60, probes=1, clock=clock
+    )
+    State = breaker_module.CircuitState
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.failure()
+    assert breaker.state is State.OPEN
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.sleep(60)
+    assert breaker.allow()
+    assert breaker.state is State.HALF_OPEN
+    assert not breaker.allow()
+    breaker.failure()
+    assert breaker.state is State.OPEN
+    clock.sleep(60)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state is State.CLOSED
+    assert breaker.allow()
+
+
+def test_transport_skips_calls_while_open(breaker_module):
+    from metrics import CIRCUIT_REJECTED
+    from transport import Transport
+    breaker = breaker_module.CircuitBreaker(
+        'practicum-test', failure_threshold=2, clock=VirtualClock()
+    )
+    transport = Transport(pool_size=1, breaker=breaker)
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        if len(calls) == 1:
+            raise requests.ConnectionError('refused')
+        return SimpleNamespace(status_code=503)
+
+    transport.session.get = get
+    with pytest.raises(requests.ConnectionError):
+        transport.get('http://api')
+    transport.get('http://api')
+    for _ in range(10):
+        with pytest.raises(CircuitOpenError):
+            transport.get('http://api')
+    assert len(calls) == 2
+    assert CIRCUIT_REJECTED.value('practicum-test') == 10
+
+
+def test_outbox_holds_messages_while_open(breaker_module):
+    from outbox import TelegramOutbox
+    from retry import RetryPolicy
+    from tests.test_outbox import RecordingBot, wait_for
+
+    class FailingBot(RecordingBot):
+        failures = 2
+
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            if self.failures:
+                self.failures -= 1
+                raise requests.ConnectionError('Телеграм недоступен')
+            super().send_message(chat_id, text)
+
+    bot = FailingBot()
+    breaker = breaker_module.CircuitBreaker(
+        'telegram-test', failure_threshold=2, reset_timeout=0.2
+    )
+    outbox = TelegramOutbox(bot, senders=1, breaker=breaker,
+                            retry=RetryPolicy(base_delay=0.05))
+    outbox.start()
+    for index in range(3):
+        outbox.send(index, str(index))
+    assert wait_for(lambda: breaker.state.name == 'OPEN')
+    assert wait_for(lambda: outbox.stats()['queued'] == 3)
+    assert wait_for(lambda: len(bot.messages) == 3, timeout=1.5)
+    assert sorted(bot.messages) == [(0, '0'), (1, '1'), (2, '2')]
+    assert breaker.state.name == 'CLOSED'
+    assert outbox.stats()['failed'] == 0
+
+
+def test_open_circuit_is_not_sent_to_student(breaker_module):
+    import homework
+    from tenants import Tenant
+    breaker = breaker_module.CircuitBreaker('api', failure_threshold=1)
+    breaker.failure()
+
+    def get(**kwargs):
+        breaker.check()
+
+    sent = []
+    tenant = Tenant('token', 1)
+    for _ in range(3):
+        homeworks, error = homework.poll_api(
+            tenant, sent.append, SimpleNamespace(get=get)
+        )
+        assert isinstance(error, CircuitOpenError)
+    assert sent == []
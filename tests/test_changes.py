@@ -0,0 +1,150 @@
+import pytest
+
+from records import Homework
+
+
+@pytest.fixture
+def tenant():
+    from tenants import Tenant
+    return Tenant('token', 12345)
+
+
+def make_homework(id, status, date_updated):
+    return {
+        'id': id,
+        'homework_name': f'hw{id}.zip',
+        'status': status,
+        'date_updated': date_updated,
+    }
+
+
+def test_status_changes_in_date_order(homework_module):
+    homeworks = [
+        make_homework(3, 'approved', '2021-04-11T10:31:09Z'),
+        make_homework(2, 'reviewing', '2021-04-10T10:31:09Z'),
+        make_homework(1, 'rejected', '2021-04-09T10:31:09Z'),
+        make_homework(3, 'reviewing', '2021-04-08T10:31:09Z'),
+    ]
+    statuses = {2: 'reviewing', 1: 'reviewing'}
+    changes = homework_module.get_status_changes(
+        [Homework.from_dict(homework) for homework in homeworks], statuses
+    )
+    assert [(hw.id, hw.status) for hw in changes] == [
+        (1, 'rejected'), (3, 'approved')
+    ]
+
+
+def test_poll_sends_every_change(monkeypatch, homework_module, tenant):
+    response = {
+        'homeworks': [
+            make_homework(2, 'approved', '2021-04-11T10:31:09Z'),
+            make_homework(1, 'reviewing', '2021-04-10T10:31:09Z'),
+        ],
+        'current_date': 1000,
+    }
+    monkeypatch.setattr(
+        homework_module, 'request_api_answer', lambda *args: response
+    )
+    sent = []
+
+    def send(message):
+        sent.append(message)
+        return True
+
+    homework_module.poll_api(tenant, send)
+    assert [message.split('"')[1] for message in sent] == [
+        'hw1.zip', 'hw2.zip'
+    ]
+    assert tenant.statuses == {1: 'reviewing', 2: 'approved'}
+    assert tenant.timestamp == 1000
+
+
+def test_poll_keeps_cursor_when_send_fails(
+        monkeypatch, homework_module, tenant
+):
+    response = {
+        'homeworks': [make_homework(1, 'approved', '2021-04-11T10:31:09Z')],
+        'current_date': 1000,
+    }
+    monkeypatch.setattr(
+        homework_module, 'request_api_answer', lambda *args: response
+    )
+    homework_module.poll_api(tenant, lambda message: False)
+    assert tenant.statuses == {}
+    assert tenant.timestamp == 0
+
+
+def test_request_window_overlaps_by_skew(monkeypatch, homework_module):
+    from cursor import CURSORS
+    from tenants import Tenant
+    requested = []
+
+    def request_api_answer(timestamp, *args):
+        requested.append(timestamp)
+        return {'homeworks': [], 'current_date': 5000}
+
+    monkeypatch.setattr(
+        homework_module, 'request_api_answer', request_api_answer
+    )
+    tenant = Tenant('token', 1, 1000)
+    homework_module.poll_api(tenant, lambda message: True)
+    homework_module.poll_api(tenant, lambda message: True)
+    assert requested == [1000 - CURSORS.skew, 5000 - CURSORS.skew]
+
+
+def test_stale_version_in_overlap_is_ignored(
+        monkeypatch, homework_module, tenant
+):
+    responses = iter([
+        {'homeworks': [make_homework(1, 'approved', '2021-04-11T10:31:09Z')],
+         'current_date': 1618137100},
+        {'homeworks': [make_homework(1, 'reviewing', '2021-04-11T10:30:00Z'),
+                       make_homework(2, 'reviewing', '2021-04-11T10:31:30Z')],
+         'current_date': 1618137120},
+    ])
+    monkeypatch.setattr(
+        homework_module, 'request_api_answer',
+        lambda *args: next(responses)
+    )
+    sent = []
+
+    def send(message):
+        sent.append(message.split('"')[1])
+        return True
+
+    homework_module.poll_api(tenant, send)
+    homework_module.poll_api(tenant, send)
+    assert sent == ['hw1.zip', 'hw2.zip']
+    assert tenant.statuses == {1: 'approved', 2: 'reviewing'}
+    assert tenant.timestamp == 1618137120
+    assert set(tenant.marks) == {1, 2}
+
+
+def test_marks_outside_window_are_dropped(homework_module):
+    from cursor import CursorManager
+    from records import HomeworkStatus
+    from tenants import Tenant
+    tenant = Tenant('token', 1)
+    cursors = CursorManager(skew=60)
+    cursors.advance(tenant, {'current_date': 1000}, [
+        Homework(1, 'old.zip', HomeworkStatus.APPROVED, 900),
+        Homework(2, 'new.zip', HomeworkStatus.REVIEWING, 990),
+    ])
+    assert tenant.marks == {2: 990}
+    cursors.advance(tenant, {}, [
+        Homework(3, 'late.zip', HomeworkStatus.REVIEWING, 1100),
+    ])
+    assert tenant.timestamp == 1100
+    assert tenant.marks == {3: 1100}
+
+
+def test_empty_response_advances_timestamp(homework_module, tenant):
+    tenant.timestamp = 1000
+    assert homework_module.deliver_changes(
+        tenant, {'homeworks': [], 'current_date': 2000}, lambda message: True
+    )
+    assert tenant.timestamp == 2000
+    assert homework_module.deliver_changes(
+        tenant, {'homeworks': []}, lambda message: True
+    )
+    assert tenant.timestamp == 2000
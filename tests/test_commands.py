@@ -0,0 +1,105 @@
+import pytest
+from telebot import TeleBot, types
+
+from records import Homework, HomeworkStatus
+from tenants import Tenant
+
+
+@pytest.fixture
+def commands_module():
+    import commands
+    return commands
+
+
+def command_message(chat_id, text):
+    return types.Message.de_json({
+        'message_id': 1,
+        'date': 0,
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Студент'},
+        'text': text,
+        'entities': [{'type': 'bot_command', 'offset': 0,
+                      'length': len(text)}],
+    })
+
+
+def test_commands_are_served_from_tenant_state(
+        commands_module, monkeypatch
+):
+    import homework
+    tenant = Tenant('token', '42')
+    homework.deliver_changes(tenant, {'homeworks': [
+        {'id': 1, 'homework_name': 'hw1.zip', 'status': 'reviewing',
+         'date_updated': '2024-01-01T10:00:00Z'},
+        {'id': 2, 'homework_name': 'hw2.zip', 'status': 'approved',
+         'date_updated': '2024-01-02T10:00:00Z'},
+    ], 'current_date': 1}, lambda message: True)
+    monkeypatch.setattr(homework.requests, 'get', None)
+    replies = []
+    bot = commands_module.register_commands(
+        TeleBot('123:token', threaded=False), [tenant],
+        lambda chat_id, text: replies.append((chat_id, text))
+    )
+    bot.process_new_messages([
+        command_message(42, '/status'),
+        command_message(42, '/history'),
+        command_message(7, '/status'),
+    ])
+    (_, status), (_, history), (other_chat, unknown) = replies
+    assert '"hw1.zip". ' + homework.HOMEWORK_VERDICTS['reviewing'] in status
+    assert '"hw2.zip". ' + homework.HOMEWORK_VERDICTS['approved'] in status
+    assert history.splitlines()[1].startswith('02.01.2024 10:00 "hw2.zip"')
+    assert (other_chat, unknown) == (7, commands_module.UNKNOWN_CHAT)
+
+
+def test_history_is_bounded(commands_module):
+    tenant = Tenant('token', '42')
+    assert commands_module.format_history(tenant) == (
+        commands_module.NO_HOMEWORKS
+    )
+    for index in range(30):
+        tenant.history.append(
+            Homework(index, f'hw{index}.zip', HomeworkStatus.REJECTED)
+        )
+    lines = commands_module.format_history(tenant).splitlines()
+    assert len(lines) == 1 + tenant.history.maxlen
+    assert lines[1].startswith('"hw29.zip"')
+
+
+def test_status_survives_restart(tmp_path, commands_module):
+    import homework
+    from storage import StateStore
+    path = str(tmp_path / 'state.json')
+    tenant = Tenant('token', '42')
+    homework.deliver_changes(tenant, {'homeworks': [
+        {'id': 1, 'homework_name': 'hw1.zip', 'status': 'approved'},
+    ], 'current_date': 1}, lambda message: True)
+    store = StateStore(path)
+    store.save(tenant)
+    store.flush()
+
+    restored = Tenant('token', '42')
+    StateStore(path).restore(restored)
+    assert '"hw1.zip". ' + homework.HOMEWORK_VERDICTS['approved'] in (
+        commands_module.format_status(restored)
+    )
+    assert '"hw1.zip". ' + homework.HOMEWORK_VERDICTS['approved'] in (
+        commands_module.format_history(restored)
+    )
+
+
+def test_commands_use_lookup_for_other_shards(commands_module):
+    replies = []
+    remote = Tenant('token', '7')
+    bot = commands_module.register_commands(
+        TeleBot('123:token', threaded=False), [Tenant('token', '42')],
+        lambda chat_id, text: replies.append((chat_id, text)),
+        lambda chat_id: remote if str(chat_id) == '7' else None
+    )
+    bot.process_new_messages([
+        command_message(7, '/status'), command_message(8, '/status'),
+    ])
+    assert replies == [
+        (7, commands_module.NO_HOMEWORKS),
+        (8, commands_module.UNKNOWN_CHAT),
+    ]
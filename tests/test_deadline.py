@@ -0,0 +1,68 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import tests.check_utils as check_utils
+from clock import VirtualClock
+from exceptions import DeadlineExceeded
+
+
+@pytest.fixture
+def deadline_module():
+    import deadline
+    return deadline
+
+
+def test_timeouts_are_derived_from_deadline(deadline_module):
+    clock = VirtualClock()
+    deadline = deadline_module.Deadline(10, clock)
+    assert deadline.timeout(3, 27) == (3, 10)
+    clock.sleep(8)
+    assert deadline.timeout(3, 27) == (2, 2)
+    clock.sleep(2)
+    assert deadline.expired()
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout()
+
+
+def test_requests_get_receives_timeout(deadline_module, monkeypatch):
+    import homework
+    timeouts = []
+
+    def get(*args, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        return check_utils.MockResponseGET(random_timestamp=1)
+
+    monkeypatch.setattr(homework.requests, 'get', get)
+    homework.get_api_answer(0)
+    with deadline_module.deadline_context(1):
+        homework.get_api_answer(0)
+    assert timeouts[0] == deadline_module.REQUEST_TIMEOUT
+    assert 0 < timeouts[1][0] <= timeouts[1][1] <= 1
+
+
+def test_overrun_is_counted_and_send_is_skipped(monkeypatch):
+    import homework
+    from metrics import POLL_DEADLINE_OVERRUNS
+    from tenants import Tenant
+
+    def slow_get(url, **kwargs):
+        time.sleep(0.1)
+        return check_utils.MockResponseGET(random_timestamp=1, data={
+            'homeworks': [{'homework_name': 'hw.zip', 'status': 'approved'}],
+            'current_date': 1,
+        })
+
+    bot = check_utils.MockTelegramBot()
+    monkeypatch.setattr(homework, 'POLL_DEADLINE', 0.05)
+    overruns = POLL_DEADLINE_OVERRUNS.value()
+    tenant = Tenant('token', 1)
+    homeworks, error = homework.poll_api(
+        tenant,
+        lambda message: homework.send_message_to_chat(bot, 1, message),
+        SimpleNamespace(get=slow_get)
+    )
+    assert POLL_DEADLINE_OVERRUNS.value() == overruns + 1
+    assert tenant.statuses == {}
+    assert tenant.timestamp == 0
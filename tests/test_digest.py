@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from records import Homework
+
+
+@pytest.fixture
+def digest_module():
+    import digest
+    return digest
+
+
+def make_homework(id, status):
+    return Homework.from_dict(
+        {'id': id, 'homework_name': f'hw{id}.zip', 'status': status}
+    )
+
+
+def test_digest_collapses_intermediate_states(digest_module, homework_module):
+    sent = []
+    digest = digest_module.DigestBuffer(
+        lambda chat_id, message: sent.append((chat_id, message)), window=60
+    )
+    digest.add(1, make_homework(1, 'reviewing'))
+    digest.add(1, make_homework(2, 'reviewing'))
+    digest.add(1, make_homework(1, 'approved'))
+    digest.add(2, make_homework(3, 'rejected'))
+    digest.flush()
+    messages = dict(sent)
+    verdicts = homework_module.HOMEWORK_VERDICTS
+    assert messages[1] == digest_module.HOMEWORK_STATUSES_DIGEST.format(
+        changes=f'"hw2.zip". {verdicts["reviewing"]}\n'
+                f'"hw1.zip". {verdicts["approved"]}'
+    )
+    assert messages[2] == homework_module.HOMEWORK_STATUS_IS_CHANGED.format(
+        homework_name='hw3.zip', verdict=verdicts['rejected']
+    )
+
+
+def test_digest_is_sent_after_window(digest_module):
+    sent = []
+    digest = digest_module.DigestBuffer(
+        lambda chat_id, message: sent.append(chat_id), window=0.1
+    ).start()
+    digest.add(1, make_homework(1, 'approved'))
+    time.sleep(0.05)
+    assert sent == []
+    time.sleep(0.2)
+    assert sent == [1]
+
+
+def test_digest_changes_survive_restart(tmp_path, digest_module):
+    from outbox import MessageJournal
+    path = str(tmp_path / 'outbox.db')
+    digest = digest_module.DigestBuffer(
+        lambda chat_id, message: True, window=60,
+        journal=MessageJournal(path, table='digest')
+    )
+    assert digest.add('1', make_homework(1, 'reviewing'))
+    assert digest.add('1', make_homework(1, 'approved'))
+    sent = []
+    journal = MessageJournal(path, table='digest')
+    restarted = digest_module.DigestBuffer(
+        lambda chat_id, message: sent.append((chat_id, message)) or True,
+        window=60, journal=journal
+    ).start()
+    restarted.flush()
+    assert [chat_id for chat_id, _ in sent] == ['1']
+    assert 'hw1.zip' in sent[0][1]
+    assert journal.pending() == []
+    assert MessageJournal(path).pending() == []
@@ -0,0 +1,171 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from types import SimpleNamespace
+
+import pytest
+
+import tests.check_utils as check_utils
+
+
+@pytest.fixture
+def engine_module():
+    import engine
+    return engine
+
+
+@pytest.fixture
+def tenants_module():
+    import tenants
+    return tenants
+
+
+def test_load_tenants_from_json(tmp_path, tenants_module):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps([
+        {'token': 'first', 'chat_id': '1'},
+        {'token': 'second', 'chat_id': '2'},
+    ]))
+    tenants = tenants_module.load_tenants(str(path), 100)
+    assert [tenant.chat_id for tenant in tenants] == ['1', '2']
+    assert tenants[0].timestamp == 100
+    assert tenants[1].headers == {'Authorization': 'OAuth second'}
+
+
+def test_load_tenants_from_sqlite(tmp_path, tenants_module):
+    path = str(tmp_path / 'tenants.db')
+    with closing(sqlite3.connect(path)) as connection:
+        connection.execute('CREATE TABLE tenants (token TEXT, chat_id TEXT)')
+        connection.execute("INSERT INTO tenants VALUES ('token', '42')")
+        connection.commit()
+    tenants = tenants_module.load_tenants(path)
+    assert [(tenant.token, tenant.chat_id) for tenant in tenants] == [
+        ('token', '42')
+    ]
+
+
+def test_load_empty_registry(tmp_path, tenants_module):
+    path = tmp_path / 'tenants.json'
+    path.write_text('[]')
+    with pytest.raises(ValueError):
+        tenants_module.load_tenants(str(path))
+
+
+def test_engine_polls_every_due_tenant(
+        random_timestamp, data_with_new_hw_status,
+        engine_module, tenants_module
+):
+    def mock_response_get(*args, **kwargs):
+        return check_utils.MockResponseGET(
+            *args, random_timestamp=random_timestamp,
+            data=data_with_new_hw_status, **kwargs
+        )
+
+    bot = check_utils.MockTelegramBot()
+    tenants = [tenants_module.Tenant(str(index), index) for index in range(5)]
+    engine = engine_module.PollingEngine(
+        bot, tenants, max_workers=2,
+        transport=SimpleNamespace(get=mock_response_get)
+    )
+    engine.schedule = [(0, index, tenant)
+                       for index, tenant in enumerate(tenants)]
+    assert engine.run_pending() > 0
+    engine.executor.shutdown(wait=True)
+    for tenant in tenants:
+        assert tenant.timestamp == random_timestamp
+        assert 'hw123.zip' in tenant.last_message
+    assert len(engine.schedule) == len(tenants)
+
+
+def test_engine_stop_interrupts_run(engine_module, tenants_module):
+    engine = engine_module.PollingEngine(
+        check_utils.MockTelegramBot(), [tenants_module.Tenant('token', 1)],
+        max_workers=1, retry_period=600, transport=SimpleNamespace()
+    )
+    engine.schedule = [(float('inf'), 0, engine.schedule[0][2])]
+    runner = threading.Thread(target=engine.run)
+    runner.start()
+    started = time.monotonic()
+    engine.stop()
+    runner.join(timeout=1)
+    assert not runner.is_alive()
+    assert time.monotonic() - started < 0.5
+    assert engine.shutdown(timeout=0.1)
+
+
+def test_engine_shutdown_waits_for_polls(engine_module, tenants_module):
+    engine = engine_module.PollingEngine(
+        check_utils.MockTelegramBot(), [tenants_module.Tenant('token', 1)],
+        max_workers=2, transport=SimpleNamespace()
+    )
+    engine.slots.acquire()
+    assert not engine.shutdown(timeout=0.05)
+    assert engine.run_pending() == engine.retry_period
+
+
+def test_engine_advances_cursor_on_unchanged_response(
+        engine_module, tenants_module
+):
+    import transport
+    current_dates = iter([1000, 2000, 3000])
+
+    def get(url, headers, params):
+        content = b'{"homeworks": [], "current_date": %d}' % next(
+            current_dates
+        )
+        return SimpleNamespace(
+            status_code=200, headers={}, content=content,
+            json=lambda: json.loads(content)
+        )
+
+    tenant = tenants_module.Tenant('token', 1, 0)
+    cache = transport.ResponseCache()
+    engine = engine_module.PollingEngine(
+        check_utils.MockTelegramBot(), [tenant], max_workers=1,
+        transport=SimpleNamespace(get=get), cache=cache
+    )
+    for expected in [1000, 2000, 3000]:
+        engine.slots.acquire()
+        engine.poll(0, tenant, 0)
+        assert tenant.timestamp == expected
+    assert cache.stats() == {'hits': 2, 'misses': 1}
+
+
+def test_engine_falls_back_to_single_tenant(
+        tmp_path, monkeypatch, engine_module
+):
+    monkeypatch.setattr(
+        engine_module, 'TENANTS_FILE', str(tmp_path / 'missing.json')
+    )
+    monkeypatch.setattr(engine_module, 'PRACTICUM_TOKEN', 'token')
+    monkeypatch.setattr(engine_module, 'TELEGRAM_CHAT_ID', '42')
+    tenant, = engine_module.registry_tenants(100)
+    assert (tenant.token, tenant.chat_id, tenant.timestamp) == (
+        'token', '42', 100
+    )
+    monkeypatch.setattr(engine_module, 'PRACTICUM_TOKEN', None)
+    with pytest.raises(FileNotFoundError):
+        engine_module.registry_tenants(100)
+
+
+def test_shard_lookup_reads_other_partition(
+        tmp_path, engine_module, tenants_module
+):
+    from sharding import HashRing, partition_path
+    from storage import StateStore
+    path = str(tmp_path / 'state.json')
+    ring = HashRing(2)
+    tenants = [tenants_module.Tenant(str(index), str(index))
+               for index in range(10)]
+    remote = next(tenant for tenant in tenants
+                  if ring.shard_for(tenant.chat_id) == 1)
+    remote.timestamp = 500
+    store = StateStore(partition_path(path, 1, 2))
+    store.save(remote)
+    store.flush()
+    lookup = engine_module.shard_lookup(tenants, path, 2)
+    found = lookup(remote.chat_id)
+    assert (found.chat_id, found.timestamp) == (remote.chat_id, 500)
+    assert lookup('unknown') is None
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+import tests.check_utils as check_utils
+
+
+@pytest.fixture
+def leases_module():
+    import leases
+    return leases
+
+
+@pytest.fixture
+def replicas(tmp_path, leases_module):
+    from clock import VirtualClock
+    clock = VirtualClock(1000)
+    path = str(tmp_path / 'leases.db')
+    first = leases_module.LeaseStore(path, 'first', ttl=30, clock=clock)
+    second = leases_module.LeaseStore(path, 'second', ttl=30, clock=clock)
+    yield clock, first, second
+    first.close()
+    second.close()
+
+
+def test_tenant_has_single_owner(replicas):
+    from tenants import Tenant
+    _, first, second = replicas
+    assert first.acquire(Tenant('token', 1))
+    assert not second.acquire(Tenant('token', 1))
+    assert second.acquire(Tenant('token', 2))
+    assert first.acquire(Tenant('token', 1))
+
+
+def test_expired_lease_moves_with_state(replicas):
+    from tenants import Tenant
+    clock, first, second = replicas
+    tenant = Tenant('token', 1, 100)
+    assert first.acquire(tenant)
+    tenant.timestamp = 500
+    tenant.statuses = {7: 'approved'}
+    first.save(tenant)
+    clock.sleep(20)
+    first.renew()
+    clock.sleep(20)
+    assert not second.acquire(Tenant('token', 1))
+    clock.sleep(31)
+
+    standby = Tenant('token', 1, 100)
+    assert second.acquire(standby)
+    assert standby.timestamp == 500
+    assert [status.value for status in standby.statuses.values()] == [
+        'approved'
+    ]
+    assert not first.acquire(tenant)
+
+
+def test_released_lease_moves_at_once(replicas):
+    from tenants import Tenant
+    _, first, second = replicas
+    assert first.acquire(Tenant('token', 1))
+    first.release()
+    assert second.acquire(Tenant('token', 1))
+
+
+def test_engine_skips_tenant_owned_elsewhere(replicas):
+    import engine
+    from tenants import Tenant
+    _, first, second = replicas
+    tenant = Tenant('token', 1)
+    assert first.acquire(tenant)
+
+    def fail_get(*args, **kwargs):
+        raise AssertionError('Опрошен студент другого экземпляра.')
+
+    polling = engine.PollingEngine(
+        check_utils.MockTelegramBot(), [tenant], max_workers=1,
+        transport=SimpleNamespace(get=fail_get), lease=second
+    )
+    polling.schedule = [(0, 0, tenant)]
+    polling.run_pending()
+    polling.executor.shutdown(wait=True)
+    due, _, _ = polling.schedule[0]
+    assert due - polling.clock.monotonic() == pytest.approx(30, abs=1)
+
+
+def test_replicas_get_own_files(monkeypatch, leases_module):
+    monkeypatch.setattr(leases_module, 'REPLICA_ID', None)
+    monkeypatch.setenv('DYNO', 'worker.1')
+    assert leases_module.replica_path('state.json') == 'state.json.worker.1'
+    monkeypatch.setattr(leases_module, 'REPLICA_ID', 'host/a:1')
+    assert leases_module.replica_path('state.json') == 'state.json.host_a_1'
+
+
+def test_replica_files_require_stable_id(monkeypatch, leases_module):
+    monkeypatch.setattr(leases_module, 'REPLICA_ID', None)
+    monkeypatch.delenv('DYNO', raising=False)
+    with pytest.raises(ValueError):
+        leases_module.replica_path('state.json')
@@ -0,0 +1,147 @@
+import json
+import logging
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def logs_module():
+    import logs
+    return logs
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_records_are_written_as_json_lines(
+        tmp_path, logs_module, restore_root_logger
+):
+    path = tmp_path / 'bot.log'
+    listener = logs_module.configure_logging(str(path))
+    logger = logging.getLogger('homework')
+    with logs_module.log_context(tenant='12345', iteration=7):
+        logger.debug('Статус работы не изменился.')
+        try:
+            raise ValueError('Сбой')
+        except ValueError:
+            logger.error('Ошибка', exc_info=True)
+    listener.stop()
+    first, second = [
+        json.loads(line) for line in path.read_text().splitlines()
+    ]
+    assert first['message'] == 'Статус работы не изменился.'
+    assert first['level'] == 'DEBUG'
+    assert (first['tenant'], first['iteration']) == ('12345', 7)
+    assert 'ValueError: Сбой' in second['exception']
+
+
+def test_queue_handler_does_not_format(logs_module):
+    records = []
+    handler = logs_module.FastQueueHandler(
+        type('Queue', (), {'put_nowait': staticmethod(records.append)})
+    )
+    record = logging.makeLogRecord({'msg': 'message %s', 'args': ('x',)})
+    handler.handle(record)
+    assert records == [record]
+    assert record.args == ('x',)
+
+
+def make_error_record(error_class, message):
+    try:
+        raise error_class(message)
+    except error_class:
+        return logging.makeLogRecord({
+            'name': 'homework', 'levelno': logging.ERROR,
+            'levelname': 'ERROR', 'msg': message,
+            'exc_info': sys.exc_info(),
+        })
+
+
+def test_repeated_errors_are_summarized(logs_module):
+    now = [0]
+    dedup = logs_module.DedupFilter(
+        period=60, sample_rate=10, clock=lambda: now[0]
+    )
+    passed = []
+    for second in range(0, 130, 10):
+        now[0] = second
+        record = make_error_record(ConnectionError, f'Сбой {second}')
+        if dedup.filter(record):
+            passed.append(record)
+    first, summary, second_summary = passed
+    assert first.exc_info is not None
+    assert summary.exc_info is None
+    assert 'повторилось 6 раз за 60 с' in summary.getMessage()
+    assert 'повторилось 6 раз' in second_summary.getMessage()
+    now[0] = 1000
+    assert dedup.filter(make_error_record(ConnectionError, 'Сбой'))
+    assert dedup.filter(make_error_record(KeyError, 'Сбой'))
+
+
+def test_debug_records_are_sampled(logs_module):
+    dedup = logs_module.DedupFilter(sample_rate=3)
+    passed = [
+        dedup.filter(logging.makeLogRecord({
+            'levelno': logging.DEBUG, 'msg': 'Статус работы не изменился.'
+        }))
+        for _ in range(7)
+    ]
+    assert passed == [True, False, False, True, False, False, True]
+    assert dedup.filter(logging.makeLogRecord({
+        'levelno': logging.INFO, 'msg': 'Статус работы не изменился.'
+    }))
+
+
+def test_dedup_keys_are_bounded(logs_module):
+    now = [0]
+    dedup = logs_module.DedupFilter(
+        period=60, sample_rate=10, clock=lambda: now[0], max_keys=3
+    )
+    for index in range(5):
+        dedup.filter(logging.makeLogRecord({
+            'levelno': logging.WARNING, 'msg': f'Сбой {index}'
+        }))
+        dedup.filter(logging.makeLogRecord({
+            'levelno': logging.DEBUG, 'msg': 'Запрос %s', 'args': (index,)
+        }))
+    assert len(dedup.repeats) == 3
+    assert len(dedup.samples) == 1
+    now[0] = 60
+    dedup.filter(logging.makeLogRecord({
+        'levelno': logging.WARNING, 'msg': 'Сбой 4'
+    }))
+    assert list(dedup.repeats) == [(None, logging.WARNING, 'Сбой 4')]
+    assert dedup.samples == {}
+
+
+def test_formatted_warnings_share_template(logs_module):
+    from outbox import TOO_MANY_REQUESTS
+    dedup = logs_module.DedupFilter(period=60, clock=lambda: 0)
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    handler.addFilter(dedup)
+    logger = logging.getLogger('test_formatted_warnings_share_template')
+    logger.propagate = False
+    logger.addHandler(handler)
+    for retry_after in range(3):
+        logger.warning(
+            TOO_MANY_REQUESTS.format(retry_after=retry_after),
+            extra={'template': TOO_MANY_REQUESTS}
+        )
+    logger.warning(TOO_MANY_REQUESTS.format(retry_after=5))
+    assert [record.getMessage() for record in records] == [
+        TOO_MANY_REQUESTS.format(retry_after=0),
+        TOO_MANY_REQUESTS.format(retry_after=5),
+    ]
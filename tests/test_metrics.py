@@ -0,0 +1,67 @@
+import pytest
+import requests
+
+from exceptions import ServerError
+
+
+@pytest.fixture
+def metrics_module():
+    import metrics
+    return metrics
+
+
+def test_histogram_renders_prometheus_text(metrics_module):
+    histogram = metrics_module.Histogram(
+        'test_seconds', 'Тест.', ('outcome',), buckets=(0.1, 1)
+    )
+    histogram.observe(0.05, 'ok')
+    histogram.observe(0.5, 'ok')
+    histogram.observe(5, 'ok')
+    assert histogram.render() == [
+        '# HELP test_seconds Тест.',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{outcome="ok",le="0.1"} 1',
+        'test_seconds_bucket{outcome="ok",le="1"} 2',
+        'test_seconds_bucket{outcome="ok",le="+Inf"} 3',
+        'test_seconds_sum{outcome="ok"} 5.55',
+        'test_seconds_count{outcome="ok"} 3',
+    ]
+
+
+def test_api_latency_is_split_by_outcome(
+        monkeypatch, metrics_module, homework_module
+):
+    histogram = metrics_module.API_REQUEST_SECONDS
+    before = histogram.count('ServerError'), histogram.count('ConnectionError')
+
+    def failing_get(*args, **kwargs):
+        raise requests.RequestException('Something wrong')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(
+            homework_module, 'send_api_request',
+            lambda *args: type('Response', (), {
+                'status_code': 200,
+                'json': lambda self: {'code': 'error'},
+            })()
+        )
+        with pytest.raises(ServerError):
+            homework_module.request_api_answer(0, {})
+    monkeypatch.setattr(requests, 'get', failing_get)
+    with pytest.raises(ConnectionError):
+        homework_module.request_api_answer(0, {})
+    assert histogram.count('ServerError') == before[0] + 1
+    assert histogram.count('ConnectionError') == before[1] + 1
+
+
+def test_metrics_endpoint(metrics_module):
+    server = metrics_module.start_http_server(port=0)
+    try:
+        response = requests.get(
+            f'http://127.0.0.1:{server.server_port}/metrics'
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert response.status_code == 200
+    assert '# TYPE homework_api_request_seconds histogram' in response.text
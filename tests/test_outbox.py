@@ -0,0 +1,229 @@
+import time
+
+import pytest
+from telebot.apihelper import ApiTelegramException
+
+import tests.check_utils as check_utils
+
+
+@pytest.fixture
+def outbox_module():
+    import outbox
+    return outbox
+
+
+class RecordingBot(check_utils.MockTelegramBot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.messages = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+def wait_for(condition, timeout=1):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_token_bucket_spaces_events(outbox_module):
+    bucket = outbox_module.TokenBucket(rate=2, burst=2, now=0)
+    assert [bucket.reserve(0) for _ in range(4)] == [0, 0, 0.5, 1.0]
+    assert bucket.reserve(10) == 10
+
+
+def test_outbox_delivers_in_chat_order(outbox_module):
+    bot = RecordingBot()
+    outbox = outbox_module.TelegramOutbox(bot, senders=1).start()
+    for index in range(3):
+        assert outbox.send(1, str(index))
+    outbox.send(2, 'other')
+    assert wait_for(lambda: outbox.stats()['sent'] == 4)
+    assert [text for chat_id, text in bot.messages if chat_id == 1] == [
+        '0', '1', '2'
+    ]
+    assert outbox.stats()['queued'] == 0
+
+
+def test_outbox_honours_retry_after(outbox_module):
+    class LimitedBot(RecordingBot):
+        limited = True
+
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            if self.limited:
+                self.limited = False
+                raise ApiTelegramException('send_message', None, {
+                    'error_code': 429,
+                    'description': 'Too Many Requests',
+                    'parameters': {'retry_after': 0.2},
+                })
+            super().send_message(chat_id, text)
+
+    bot = LimitedBot()
+    outbox = outbox_module.TelegramOutbox(bot, senders=1).start()
+    started = time.monotonic()
+    outbox.send(1, 'message')
+    assert wait_for(lambda: bot.messages)
+    assert time.monotonic() - started >= 0.2
+    assert outbox.stats()['failed'] == 0
+
+
+def test_outbox_close_waits_for_queue(outbox_module):
+    bot = RecordingBot()
+    outbox = outbox_module.TelegramOutbox(bot, senders=2).start()
+    for index in range(3):
+        outbox.send(index, str(index))
+    assert outbox.close(timeout=1)
+    assert len(bot.messages) == 3
+    for _ in range(5):
+        outbox.send(1, 'limited')
+    assert not outbox.close(timeout=0.1)
+
+
+def test_journal_survives_restart(tmp_path, outbox_module):
+    path = str(tmp_path / 'outbox.db')
+    stopped = outbox_module.TelegramOutbox(
+        RecordingBot(), journal=outbox_module.MessageJournal(path)
+    )
+    assert stopped.send(1, 'first')
+    assert stopped.send(2, 'second')
+
+    bot = RecordingBot()
+    journal = outbox_module.MessageJournal(path)
+    outbox = outbox_module.TelegramOutbox(bot, journal=journal).start()
+    assert outbox.close(timeout=1)
+    assert sorted(bot.messages) == [('1', 'first'), ('2', 'second')]
+    assert journal.pending() == []
+
+
+def test_outbox_retries_transient_failures(tmp_path, outbox_module):
+    from retry import RetryPolicy
+
+    class FlakyBot(RecordingBot):
+        failures = 2
+
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            if self.failures:
+                self.failures -= 1
+                raise ApiTelegramException('send_message', None, {
+                    'error_code': 502, 'description': 'Bad Gateway',
+                })
+            super().send_message(chat_id, text)
+
+    bot = FlakyBot()
+    journal = outbox_module.MessageJournal(str(tmp_path / 'outbox.db'))
+    outbox = outbox_module.TelegramOutbox(
+        bot, senders=1, journal=journal,
+        retry=RetryPolicy(base_delay=0.05)
+    ).start()
+    outbox.send(1, 'message')
+    assert outbox.close(timeout=1)
+    assert bot.messages == [(1, 'message')]
+    assert outbox.stats()['failed'] == 0
+    assert journal.pending() == []
+
+
+def test_outbox_drops_rejected_message(tmp_path, outbox_module):
+    class BlockedBot(RecordingBot):
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            raise ApiTelegramException('send_message', None, {
+                'error_code': 403, 'description': 'Forbidden',
+            })
+
+    journal = outbox_module.MessageJournal(str(tmp_path / 'outbox.db'))
+    outbox = outbox_module.TelegramOutbox(
+        BlockedBot(), senders=1, journal=journal
+    ).start()
+    outbox.send(1, 'message')
+    assert outbox.close(timeout=1)
+    assert outbox.stats()['failed'] == 1
+    assert journal.pending() == []
+
+
+def test_stored_message_advances_cursor(
+        tmp_path, outbox_module, data_with_new_hw_status
+):
+    import homework
+    from tenants import Tenant
+    journal = outbox_module.MessageJournal(str(tmp_path / 'outbox.db'))
+    outbox = outbox_module.TelegramOutbox(RecordingBot(), journal=journal)
+    tenant = Tenant('token', 1, 100)
+    data_with_new_hw_status['current_date'] = 200
+
+    assert homework.deliver_changes(
+        tenant, data_with_new_hw_status,
+        lambda message: outbox.send(tenant.chat_id, message)
+    )
+    assert tenant.timestamp == 200
+    assert len(journal.pending()) == 1
+
+
+def test_journal_merges_old_partitions(tmp_path, outbox_module):
+    path = str(tmp_path / 'outbox.db')
+    legacy = outbox_module.MessageJournal(path)
+    legacy.add('1', 'first')
+    legacy.add('2', 'second')
+    old_shard = outbox_module.MessageJournal(path + '.shard1')
+    old_shard.add('1', 'third')
+    journal = outbox_module.MessageJournal(path + '.shard0')
+    journal.merge([path, path + '.shard0', path + '.shard1'], ['1'])
+    assert [(chat_id, message) for _, chat_id, message
+            in journal.pending()] == [('1', 'first'), ('1', 'third')]
+    assert [message for _, _, message in legacy.pending()] == ['second']
+    assert old_shard.pending() == []
+
+
+def test_outbox_keeps_chat_order_on_retry(outbox_module):
+    from retry import RetryPolicy
+
+    class FlakyBot(RecordingBot):
+        failures = 1
+        sent_at = {}
+
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            if text == '0' and self.failures:
+                self.failures -= 1
+                raise ApiTelegramException('send_message', None, {
+                    'error_code': 502, 'description': 'Bad Gateway',
+                })
+            self.sent_at[text] = time.monotonic()
+            super().send_message(chat_id, text)
+
+    bot = FlakyBot()
+    outbox = outbox_module.TelegramOutbox(
+        bot, chat_rate=5, senders=4, retry=RetryPolicy(base_delay=0.1)
+    ).start()
+    for index in range(3):
+        outbox.send(1, str(index))
+    outbox.send(2, 'other')
+    assert wait_for(lambda: (2, 'other') in bot.messages)
+    assert outbox.stats()['queued'] == 3
+    assert outbox.close(timeout=1.5)
+    assert [text for chat_id, text in bot.messages if chat_id == 1] == [
+        '0', '1', '2'
+    ]
+    assert bot.sent_at['2'] - bot.sent_at['1'] >= 0.15
+
+
+def test_resized_shards_send_moved_chats_once(tmp_path, outbox_module):
+    path = str(tmp_path / 'outbox.db')
+    paths = [path + '.shard0', path + '.shard1']
+    old_first = outbox_module.MessageJournal(paths[0])
+    old_first.add('1', 'first')
+    old_first.add('2', 'second')
+    outbox_module.MessageJournal(paths[1]).add('3', 'third')
+    bots = []
+    for shard, chat_ids in enumerate([['1', '3'], ['2']]):
+        bots.append(RecordingBot())
+        journal = outbox_module.MessageJournal(paths[shard])
+        journal.merge(paths, chat_ids)
+        outbox = outbox_module.TelegramOutbox(
+            bots[-1], journal=journal
+        ).start(chat_ids)
+        assert outbox.close(timeout=1)
+    assert sorted(bots[0].messages) == [('1', 'first'), ('3', 'third')]
+    assert bots[1].messages == [('2', 'second')]
+    for shard_path in paths:
+        assert outbox_module.MessageJournal(shard_path).pending() == []
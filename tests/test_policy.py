@@ -0,0 +1,48 @@
+import pytest
+
+from exceptions import ServerError, UnsuccessfulResponseError
+
+
+@pytest.fixture
+def policy():
+    from policy import PollingPolicy
+    return PollingPolicy(
+        retry_period=600, reviewing_period=120, idle_period=3600,
+        idle_factor=2, error_period=30, error_period_limit=240, jitter=0
+    )
+
+
+@pytest.fixture
+def tenant():
+    from tenants import Tenant
+    return Tenant('token', 1)
+
+
+def test_reviewing_is_polled_faster(policy, tenant):
+    homeworks = [{'homework_name': 'hw', 'status': 'reviewing'}]
+    tenant.statuses['hw'] = 'reviewing'
+    assert policy.next_delay(tenant, homeworks, None) == 120
+    assert policy.next_delay(tenant, [], None) == 120
+    tenant.statuses['hw'] = 'approved'
+    assert policy.next_delay(tenant, homeworks, None) == 600
+
+
+def test_idle_delay_decays_to_idle_period(policy, tenant):
+    delays = [policy.next_delay(tenant, [], None) for _ in range(4)]
+    assert delays == [1200, 2400, 3600, 3600]
+
+
+def test_transient_errors_back_off(policy, tenant):
+    delays = [policy.next_delay(tenant, None, ServerError())
+              for _ in range(6)]
+    limits = [30, 60, 120, 240, 240, 240]
+    for delay, limit in zip(delays, limits):
+        assert limit / 2 <= delay <= limit
+    policy.next_delay(tenant, [], None)
+    assert tenant.failures == 0
+
+
+def test_other_errors_use_retry_period(policy, tenant):
+    error = UnsuccessfulResponseError()
+    assert policy.next_delay(tenant, None, error) == 600
+    assert tenant.failures == 0
@@ -0,0 +1,45 @@
+import sys
+
+import pytest
+
+from records import Homework, HomeworkStatus
+
+
+def test_homework_from_dict():
+    homework = Homework.from_dict({
+        'id': 123,
+        'homework_name': 'hw123.zip',
+        'status': 'approved',
+        'reviewer_comment': 'Принято!',
+        'date_updated': '2020-02-13T14:40:57Z',
+        'lesson_name': 'Итоговый проект',
+    })
+    assert homework.id == 123
+    assert homework.homework_name == 'hw123.zip'
+    assert homework.status is HomeworkStatus.APPROVED
+    assert homework.date_updated == 1581604857
+    assert homework.key == 123
+    assert not hasattr(homework, '__dict__')
+
+
+@pytest.mark.parametrize('data, error', [
+    ({'status': 'approved'}, KeyError),
+    ({'homework_name': 'hw'}, KeyError),
+    ({'homework_name': 'hw', 'status': 'unknown'}, ValueError),
+    ({'homework_name': 'hw', 'status': 'approved', 'date_updated': 'x'},
+     ValueError),
+])
+def test_homework_from_invalid_dict(data, error):
+    with pytest.raises(error):
+        Homework.from_dict(data)
+
+
+def test_status_index_is_compact():
+    statuses = {}
+    for index in range(1000):
+        statuses[index] = Homework.from_dict(
+            {'id': index, 'homework_name': 'hw', 'status': 'reviewing'}
+        ).status
+    per_homework = sys.getsizeof(statuses) / len(statuses)
+    assert per_homework < 64
+    assert len({id(status) for status in statuses.values()}) == 1
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from clock import VirtualClock
+from exceptions import CircuitOpenError
+
+
+@pytest.fixture
+def retry_module():
+    import retry
+    return retry
+
+
+class FixedRandom:
+    def uniform(self, low, high):
+        return high
+
+
+def make_transport(responses, retry, breaker=None):
+    from transport import Transport
+    clock = VirtualClock()
+    transport = Transport(
+        pool_size=1, retry=retry, breaker=breaker, clock=clock
+    )
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(clock.monotonic())
+        result = responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return SimpleNamespace(
+            status_code=result, headers={}, close=lambda: None
+        )
+
+    transport.session.get = get
+    return transport, calls
+
+
+def test_backoff_is_capped_and_bounded_by_budget(retry_module):
+    policy = retry_module.RetryPolicy(
+        attempts=10, base_delay=1, max_delay=4, budget=10, rng=FixedRandom()
+    )
+    assert [policy.delay(attempt, 0) for attempt in range(1, 5)] == [
+        1, 2, 4, 4
+    ]
+    assert policy.delay(1, 9.5) is None
+    assert policy.delay(10, 0) is None
+    assert policy.delay(1, 0, retry_after=3) == 3
+
+
+def test_transient_errors_are_retried(retry_module):
+    transport, calls = make_transport(
+        [requests.ConnectionError('reset'), 503, 200],
+        retry_module.RetryPolicy(attempts=3, base_delay=1, rng=FixedRandom())
+    )
+    assert transport.get('http://api').status_code == 200
+    assert calls == [0, 1, 3]
+
+
+def test_client_errors_fail_fast(retry_module):
+    transport, calls = make_transport(
+        [401, 200], retry_module.RetryPolicy(attempts=3)
+    )
+    assert transport.get('http://api').status_code == 401
+    assert len(calls) == 1
+    transport, calls = make_transport(
+        [requests.TooManyRedirects('loop'), 200],
+        retry_module.RetryPolicy(attempts=3)
+    )
+    with pytest.raises(requests.TooManyRedirects):
+        transport.get('http://api')
+    assert len(calls) == 1
+
+
+def test_retries_stop_when_breaker_opens(retry_module):
+    from breaker import CircuitBreaker
+    breaker = CircuitBreaker(
+        'retry-test', failure_threshold=2, clock=VirtualClock()
+    )
+    transport, calls = make_transport(
+        [500, 500, 500], retry_module.RetryPolicy(attempts=5, base_delay=0),
+        breaker
+    )
+    with pytest.raises(CircuitOpenError):
+        transport.get('http://api')
+    assert len(calls) == 2
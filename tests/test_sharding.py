@@ -0,0 +1,87 @@
+import sys
+import time
+
+import pytest
+
+
+def exit_shard(shard, shards):
+    sys.exit(3)
+
+
+def sleep_shard(shard, shards):
+    time.sleep(60)
+
+
+@pytest.fixture
+def sharding_module():
+    import sharding
+    return sharding
+
+
+def test_ring_spreads_tenants_evenly(sharding_module):
+    ring = sharding_module.HashRing(4)
+    counts = [0] * 4
+    for chat_id in range(10_000):
+        counts[ring.shard_for(chat_id)] += 1
+    assert min(counts) > 10_000 / 4 * 0.7
+
+
+def test_ring_moves_few_tenants_on_resize(sharding_module):
+    before = sharding_module.HashRing(4)
+    after = sharding_module.HashRing(5)
+    moved = sum(before.shard_for(chat_id) != after.shard_for(chat_id)
+                for chat_id in range(10_000))
+    assert moved < 10_000 * 0.35
+
+
+def test_select_shard_partitions_tenants(sharding_module):
+    from tenants import Tenant
+    tenants = [Tenant('token', chat_id) for chat_id in range(100)]
+    shards = [sharding_module.select_shard(tenants, shard, 3)
+              for shard in range(3)]
+    assert sorted(tenant.chat_id for shard in shards for tenant in shard) == (
+        list(range(100))
+    )
+    assert sharding_module.select_shard(tenants, 0, 1) == tenants
+
+
+def test_partition_paths_include_legacy_file(tmp_path, sharding_module):
+    path = str(tmp_path / 'state.json')
+    assert sharding_module.partition_path(path, 0, 1) == path
+    for shard in range(2):
+        open(sharding_module.partition_path(path, shard, 2), 'w').close()
+    open(path + '.shard0-wal', 'w').close()
+    assert sharding_module.partition_paths(path) == [
+        path, path + '.shard0', path + '.shard1'
+    ]
+
+
+@pytest.mark.timeout(20)
+def test_supervisor_restarts_crashed_shard():
+    import supervisor
+    pool = supervisor.Supervisor(1, target=exit_shard, restart_delay=0)
+    pool.start()
+    try:
+        pool.processes[0].join(10)
+        assert pool.processes[0].exitcode == 3
+        pool.check()
+        assert pool.restarts == 1
+        assert pool.processes[0].pid is not None
+    finally:
+        pool.stop()
+
+
+@pytest.mark.timeout(20)
+def test_supervisor_resize_replaces_processes():
+    import supervisor
+    pool = supervisor.Supervisor(2, target=sleep_shard, stop_timeout=5)
+    pool.start()
+    old = list(pool.processes.values())
+    try:
+        pool.resize(3)
+        assert all(process.exitcode is not None for process in old)
+        assert sorted(pool.processes) == [0, 1, 2]
+        assert all(process.is_alive() for process in pool.processes.values())
+    finally:
+        pool.stop()
+    assert pool.processes == {}
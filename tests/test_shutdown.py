@@ -0,0 +1,65 @@
+import inspect
+import json
+import os
+import signal
+import threading
+import time
+
+import pytest
+import requests
+
+import tests.check_utils as check_utils
+
+
+@pytest.fixture
+def homework_module():
+    import homework
+    return homework
+
+
+def test_sigterm_interrupts_sleep_and_saves_state(
+        tmp_path, monkeypatch, homework_module
+):
+    state_file = tmp_path / 'state.json'
+    for name in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID'):
+        monkeypatch.setattr(homework_module, name, 'value')
+    monkeypatch.setattr(homework_module, 'STATE_FILE', str(state_file))
+    monkeypatch.setattr(
+        homework_module, 'TeleBot', check_utils.MockTelegramBot
+    )
+    monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: (
+        check_utils.MockResponseGET(random_timestamp=1234)
+    ))
+    previous = signal.getsignal(signal.SIGTERM)
+    threading.Timer(0.2, os.kill, (os.getpid(), signal.SIGTERM)).start()
+    started = time.monotonic()
+    # test_bot.py оборачивает main() с тайм-аутом прямо в модуле.
+    inspect.unwrap(homework_module.main)()
+    assert time.monotonic() - started < 1
+    assert signal.getsignal(signal.SIGTERM) is previous
+    state = json.loads(state_file.read_text())
+    assert state['value']['current_date'] == 1234
+
+
+def test_signal_during_poll_finishes_iteration(
+        tmp_path, monkeypatch, homework_module
+):
+    state_file = tmp_path / 'state.json'
+    for name in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID'):
+        monkeypatch.setattr(homework_module, name, 'value')
+    monkeypatch.setattr(homework_module, 'STATE_FILE', str(state_file))
+    monkeypatch.setattr(
+        homework_module, 'TeleBot', check_utils.MockTelegramBot
+    )
+
+    def get_during_signal(*args, **kwargs):
+        os.kill(os.getpid(), signal.SIGTERM)
+        return check_utils.MockResponseGET(random_timestamp=4321)
+
+    sleeps = []
+    monkeypatch.setattr(requests, 'get', get_during_signal)
+    monkeypatch.setattr(homework_module.time, 'sleep', sleeps.append)
+    inspect.unwrap(homework_module.main)()
+    assert sleeps == []
+    state = json.loads(state_file.read_text())
+    assert state['value']['current_date'] == 4321
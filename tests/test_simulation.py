@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+
+@pytest.fixture
+def simulation_module():
+    import simulation
+    return simulation
+
+
+def test_virtual_clock_does_not_wait():
+    from clock import VirtualClock
+    clock = VirtualClock(100)
+    clock.sleep(3600)
+    clock.sleep(-5)
+    assert clock.time() == clock.monotonic() == 3700
+
+
+def test_fixed_policy_replays_timeline(simulation_module):
+    start = simulation_module.START
+    timeline = {'token': [
+        (start + 1000, 'hw.zip', 'reviewing'),
+        (start + 5000, 'hw.zip', 'rejected'),
+        (start + 5100, 'hw.zip', 'reviewing'),
+        (start + 20000, 'hw.zip', 'approved'),
+    ]}
+    report = simulation_module.simulate(
+        timeline,
+        simulation_module.POLICIES['fixed'](random.Random(0)),
+        days=1
+    )
+    assert report['requests'] == simulation_module.DAY // 600
+    assert report['messages'] == 2
+    assert report['missed'] == 2
+    assert 0 < report['latency_max'] <= 600
+
+
+def test_outage_delays_notifications(simulation_module):
+    start = simulation_module.START
+    timeline = {'token': [(start + 1000, 'hw.zip', 'approved')]}
+    report = simulation_module.simulate(
+        timeline,
+        simulation_module.POLICIES['fixed'](random.Random(0)),
+        days=1, outages=[(start, start + 7200)]
+    )
+    assert report['missed'] == 0
+    assert 6200 <= report['latency_max'] <= 6200 + 600
+
+
+@pytest.mark.timeout(20)
+def test_adaptive_policy_beats_fixed(simulation_module):
+    import policy
+    timeline = simulation_module.generate_timeline(20, 7, random.Random(0))
+    adaptive, fixed = [
+        simulation_module.simulate(
+            timeline, simulation_module.POLICIES[name](random.Random(0)), 7
+        )
+        for name in ('adaptive', 'fixed')
+    ]
+    assert adaptive['requests'] < fixed['requests']
+    assert adaptive['latency_p50'] < fixed['latency_p50']
+    assert adaptive['missed'] <= fixed['missed']
+    assert adaptive['latency_max'] <= policy.IDLE_PERIOD * (
+        1 + policy.JITTER
+    )
@@ -0,0 +1,119 @@
+import json
+from pathlib import Path
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def storage_module():
+    import storage
+    return storage
+
+
+@pytest.fixture
+def tenant():
+    from tenants import Tenant
+    return Tenant('token', 12345, 100)
+
+
+def test_state_survives_restart(tmp_path, storage_module, tenant):
+    path = str(tmp_path / 'state.json')
+    store = storage_module.StateStore(path)
+    tenant.timestamp = 200
+    tenant.statuses[777] = 'approved'
+    store.save(tenant)
+    store.flush()
+
+    restored = type(tenant)('token', 12345, 100)
+    storage_module.StateStore(path).restore(restored)
+    assert restored.timestamp == 200
+    assert restored.statuses == {777: 'approved'}
+
+
+def test_flush_writes_only_changes(tmp_path, storage_module, tenant):
+    path = tmp_path / 'state.json'
+    store = storage_module.StateStore(str(path))
+    store.save(tenant)
+    store.flush()
+    path.write_text('{}')
+    store.save(tenant)
+    store.flush()
+    assert json.loads(path.read_text()) == {}
+    assert [item.name for item in tmp_path.iterdir()] == ['state.json']
+
+
+def test_corrupted_state_is_ignored(tmp_path, storage_module, tenant):
+    path = tmp_path / 'state.json'
+    path.write_text('{"12345": ')
+    storage_module.StateStore(str(path)).restore(tenant)
+    assert tenant.timestamp == 100
+
+
+def test_poll_skips_already_delivered_status(
+        monkeypatch, homework_module, data_with_new_hw_status
+):
+    from tenants import Tenant
+    tenant = Tenant('token', 12345)
+    tenant.statuses[777777777] = 'approved'
+    sent = []
+    monkeypatch.setattr(
+        homework_module, 'request_api_answer',
+        lambda *args: data_with_new_hw_status
+    )
+    homework_module.poll_api(tenant, sent.append)
+    assert sent == []
+    assert tenant.timestamp == data_with_new_hw_status['current_date']
+
+
+def test_merge_keeps_newest_state(tmp_path, storage_module):
+    from tenants import Tenant
+    first = storage_module.StateStore(str(tmp_path / 'state.json.shard0'))
+    second = storage_module.StateStore(str(tmp_path / 'state.json.shard1'))
+    first.save(Tenant('token', 1, 300))
+    first.save(Tenant('token', 2, 100))
+    second.save(Tenant('token', 2, 200))
+    first.flush()
+    second.flush()
+
+    store = storage_module.StateStore(second.path)
+    store.merge([first.path, second.path])
+    restored = [Tenant('token', chat_id) for chat_id in (1, 2)]
+    for tenant in restored:
+        store.restore(tenant)
+    assert [tenant.timestamp for tenant in restored] == [300, 200]
+
+
+def test_concurrent_flushes_keep_newest_state(
+        tmp_path, monkeypatch, storage_module, tenant
+):
+    path = str(tmp_path / 'state.json')
+    store = storage_module.StateStore(path)
+    write_atomic = storage_module.write_atomic
+    started = threading.Event()
+    release = threading.Event()
+    writes = []
+
+    def slow_first_write(path, data):
+        writes.append(data)
+        if len(writes) == 1:
+            started.set()
+            release.wait(1)
+        write_atomic(path, data)
+
+    monkeypatch.setattr(storage_module, 'write_atomic', slow_first_write)
+    tenant.timestamp = 200
+    store.save(tenant)
+    first = threading.Thread(target=store.flush)
+    first.start()
+    assert started.wait(1)
+    tenant.timestamp = 300
+    store.save(tenant)
+    second = threading.Thread(target=store.flush)
+    second.start()
+    second.join(0.1)
+    release.set()
+    first.join()
+    second.join()
+    state = json.loads(Path(path).read_text())
+    assert state['12345']['current_date'] == 300
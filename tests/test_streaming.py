@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from exceptions import ServerError
+from records import Homework
+from tests.check_utils import StreamedResponse
+
+
+@pytest.fixture(params=['json', 'ijson'])
+def streaming_module(request, monkeypatch):
+    import streaming
+    if request.param == 'json':
+        monkeypatch.setattr(streaming, 'ijson', None)
+    elif streaming.ijson is None:
+        pytest.skip('ijson не установлен')
+    return streaming
+
+
+def stream(streaming_module, body, status_code=200):
+    transport = type('Transport', (), {
+        'get': staticmethod(
+            lambda **kwargs: StreamedResponse(body, status_code)
+        )
+    })
+    return list(streaming_module.stream_homeworks(0, {}, transport))
+
+
+def test_stream_yields_every_homework(streaming_module):
+    homeworks = [
+        {'id': index, 'homework_name': f'hw{index}', 'status': 'approved',
+         'lesson_name': 'Проект спринта: «Деплой бота»'}
+        for index in range(50)
+    ]
+    body = json.dumps(
+        {'current_date': 123, 'homeworks': homeworks}, ensure_ascii=False
+    )
+    assert stream(streaming_module, body) == [
+        Homework.from_dict(homework) for homework in homeworks
+    ]
+
+
+def test_stream_empty_history(streaming_module):
+    body = '{"homeworks": [], "current_date": 1}'
+    assert stream(streaming_module, body) == []
+
+
+@pytest.mark.parametrize('body, error', [
+    ('{"current_date": 1}', KeyError),
+    ('[{"homeworks": []}]', TypeError),
+    ('{"homeworks": {"status": "approved"}}', TypeError),
+    ('{"homeworks": [{"homework_name": "hw", "status": "unknown"}]}',
+     ValueError),
+])
+def test_stream_invalid_response(streaming_module, body, error):
+    with pytest.raises(error):
+        stream(streaming_module, body)
+
+
+def test_stream_server_error(streaming_module):
+    with pytest.raises(ServerError):
+        stream(streaming_module, '{"code": "not_authenticated"}', 401)
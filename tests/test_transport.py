@@ -0,0 +1,129 @@
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    current_date = itertools.count()
+
+    def do_GET(self):
+        body = (
+            '{"homeworks": [], "current_date": %d}' % next(self.current_date)
+        ).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(401)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport_module():
+    import transport
+    return transport
+
+
+def test_transport_reuses_connection(local_url, transport_module):
+    transport = transport_module.Transport(pool_size=2)
+    transport.prewarm(local_url)
+    for _ in range(3):
+        assert transport.get(local_url).json()['homeworks'] == []
+    stats = transport.stats()
+    transport.close()
+    assert stats['requests'] == 3
+    assert stats['connections_opened'] == 1
+    assert stats['pool_requests'] == 4
+    assert stats['idle_connections'] == 1
+
+
+def test_request_api_answer_uses_transport(
+        local_url, monkeypatch, homework_module, transport_module
+):
+    monkeypatch.setattr(homework_module, 'ENDPOINT', local_url)
+    transport = transport_module.Transport()
+    response = homework_module.request_api_answer(0, {}, transport)
+    transport.close()
+    assert response['homeworks'] == []
+
+
+def test_unchanged_response_is_skipped(
+        local_url, monkeypatch, homework_module, transport_module
+):
+    monkeypatch.setattr(homework_module, 'ENDPOINT', local_url)
+    transport = transport_module.Transport()
+    cache = transport_module.ResponseCache()
+    headers = {'Authorization': 'OAuth token'}
+    first = homework_module.request_api_answer(0, headers, transport, cache)
+    again = homework_module.request_api_answer(0, headers, transport, cache)
+    cache.commit(headers)
+    skipped = homework_module.request_api_answer(0, headers, transport, cache)
+    transport.close()
+    assert first is not None and again is not None
+    assert skipped is None
+    assert cache.stats() == {'hits': 1, 'misses': 2}
+
+
+def test_etag_is_sent_only_after_commit(
+        monkeypatch, homework_module, transport_module
+):
+    requests = []
+
+    class ETagHandler(KeepAliveHandler):
+        def do_GET(self):
+            requests.append(self.headers.get('If-None-Match'))
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = b'{"homeworks": [], "current_date": 1}'
+            self.send_response(200)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ETagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(homework_module, 'ENDPOINT',
+                        f'http://127.0.0.1:{server.server_port}/')
+    transport = transport_module.Transport()
+    cache = transport_module.ResponseCache()
+    headers = {'Authorization': 'OAuth token'}
+    try:
+        failed = homework_module.request_api_answer(
+            0, headers, transport, cache
+        )
+        retried = homework_module.request_api_answer(
+            0, headers, transport, cache
+        )
+        cache.commit(headers)
+        homework_module.request_api_answer(0, headers, transport, cache)
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
+    assert failed is not None and retried is not None
+    assert requests == [None, None, '"v1"']
+    assert cache.stats() == {'hits': 1, 'misses': 2}
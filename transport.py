@@ -0,0 +1,271 @@
+import hashlib
+from http import HTTPStatus
+import logging
+import os
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from clock import SYSTEM_CLOCK
+from deadline import REQUEST_TIMEOUT, remaining_time, request_timeout
+from metrics import API_RETRIES
+from retry import RETRY_STATUSES, retry_after
+
+
+POOL_SIZE = int(os.getenv('POOL_SIZE', 32))
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*(\d+)')
+
+PREWARM_ERROR = 'Не удалось заранее открыть соединение с {url}: {error}.'
+PREWARM_DONE = 'Открыто соединение с {url}. Статистика пула: {stats}.'
+RETRYING = ('Запрос к {url} не удался ({reason}), попытка {attempt} '
+            'через {delay:.2f} с.')
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+logger = logging.getLogger(__name__)
+
+
+class Transport:
+    """Общий пул keep-alive соединений для запросов к API.
+    Соединения переиспользуются между запросами и студентами,
+    поэтому TCP и TLS рукопожатие выполняется только при открытии
+    нового соединения.
+    Если передан breaker, сбои сети и ответы 5xx учитываются
+    предохранителем, а при открытом предохранителе запрос
+    не выполняется.
+    Если передан retry, временные сбои сети и ответы 429 и 5xx
+    повторяются по его правилам, остальные ошибки возвращаются сразу.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT,
+                 breaker=None, retry=None, clock=SYSTEM_CLOCK):
+        self.timeout = timeout
+        self.breaker = breaker
+        self.retry = retry
+        self.clock = clock
+        self.adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, pool_block=True
+        )
+        self.session = requests.Session()
+        self.session.headers['Connection'] = 'keep-alive'
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.lock = threading.Lock()
+        self.requests_count = 0
+
+    def get(self, url, **kwargs):
+        """Выполнит GET-запрос через пул соединений.
+        Временные сбои повторяются, если задан retry.
+        Тайм-ауты каждой попытки не выходят за срок текущей итерации.
+        """
+        timeout = kwargs.pop('timeout', self.timeout)
+        started = self.clock.monotonic()
+        attempt = 1
+        while True:
+            try:
+                response = self.attempt(
+                    url, timeout=request_timeout(timeout), **kwargs
+                )
+            except RETRYABLE_ERRORS as error:
+                delay = self.retry_delay(attempt, started)
+                if delay is None:
+                    raise
+                reason = type(error).__name__
+            else:
+                if (self.retry is None
+                        or response.status_code not in RETRY_STATUSES):
+                    return response
+                delay = self.retry_delay(
+                    attempt, started, retry_after(response)
+                )
+                if delay is None:
+                    return response
+                response.close()
+                reason = response.status_code
+            API_RETRIES.inc(str(reason))
+            attempt += 1
+            logger.debug(RETRYING.format(
+                url=url, reason=reason, attempt=attempt, delay=delay
+            ), extra={'template': RETRYING})
+            self.clock.sleep(delay)
+
+    def retry_delay(self, attempt, started, requested=None):
+        """Вернет задержку перед повтором или None, если повтора не будет.
+        requested - задержка, которую просит сервер.
+        """
+        if self.retry is None:
+            return None
+        delay = self.retry.delay(
+            attempt, self.clock.monotonic() - started, requested
+        )
+        remaining = remaining_time()
+        if delay is not None and remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+    def attempt(self, url, **kwargs):
+        """Выполнит одну попытку запроса с учетом предохранителя."""
+        if self.breaker is not None:
+            self.breaker.check()
+        with self.lock:
+            self.requests_count += 1
+        try:
+            response = self.session.get(url, **kwargs)
+        except requests.RequestException:
+            if self.breaker is not None:
+                self.breaker.failure()
+            raise
+        if self.breaker is not None:
+            if response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                self.breaker.failure()
+            else:
+                self.breaker.success()
+        return response
+
+    def prewarm(self, url):
+        """Заранее откроет соединение с сервером url.
+        Вызывается незадолго до запланированного опроса, чтобы сам опрос
+        не тратил время на установку соединения.
+        """
+        try:
+            self.session.head(url, timeout=self.timeout).close()
+        except requests.RequestException as error:
+            logger.debug(
+                PREWARM_ERROR.format(url=url, error=error),
+                extra={'template': PREWARM_ERROR}
+            )
+            return
+        logger.debug(
+            PREWARM_DONE.format(url=url, stats=self.stats()),
+            extra={'template': PREWARM_DONE}
+        )
+
+    def stats(self):
+        """Вернет статистику пула соединений в виде словаря."""
+        container = self.adapter.poolmanager.pools
+        pools = [container[key] for key in container.keys()]
+        return {
+            'requests': self.requests_count,
+            'pools': len(pools),
+            'connections_opened': sum(pool.num_connections for pool in pools),
+            'pool_requests': sum(pool.num_requests for pool in pools),
+            'idle_connections': sum(
+                1 for pool in pools for connection in list(pool.pool.queue)
+                if connection is not None
+            ),
+        }
+
+    def close(self):
+        """Закроет все соединения пула."""
+        self.session.close()
+
+
+class CacheEntry:
+    """Отпечатки ответов API для одного студента.
+    etag и content - ETag и отпечаток успешно обработанного ответа,
+    received_etag и received - последнего полученного,
+    current_date - метка current_date последнего ответа с телом.
+    """
+
+    __slots__ = ('etag', 'content', 'received_etag', 'received',
+                 'current_date')
+
+    def __init__(self):
+        self.etag = None
+        self.content = None
+        self.received_etag = None
+        self.received = None
+        self.current_date = None
+
+
+class ResponseCache:
+    """Отпечатки последних обработанных ответов API по студентам.
+    Если ответ не изменился с прошлого успешно обработанного опроса,
+    его не нужно декодировать, проверять и превращать в сообщения.
+    Поле current_date меняется в каждом ответе, поэтому в отпечаток
+    не входит. Для каждого студента хранятся ETag и отпечаток
+    обработанного ответа и последнего полученного: полученные
+    становятся обработанными только в commit, поэтому ответ,
+    изменения из которого не доставлены, придет снова.
+    Записи читаются и изменяются под блокировкой lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def prepare(self, headers):
+        """Вернет заголовки запроса для студента.
+        Если для обработанного ответа сервер прислал ETag,
+        добавит условие If-None-Match.
+        """
+        with self.lock:
+            entry = self.entries.get(headers['Authorization'])
+            etag = None if entry is None else entry.etag
+        if etag is None:
+            return headers
+        return {**headers, 'If-None-Match': etag}
+
+    def unchanged(self, headers, response):
+        """Проверит, совпадает ли ответ с последним обработанным."""
+        received, etag, current_date = None, None, None
+        if response.status_code == HTTPStatus.OK:
+            received = fingerprint(response.content)
+            etag = response.headers.get('ETag')
+            match = CURRENT_DATE.search(response.content)
+            if match is not None:
+                current_date = int(match.group(1))
+        key = headers['Authorization']
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = CacheEntry()
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                entry.received = entry.content
+                entry.received_etag = entry.etag
+                hit = True
+            elif response.status_code != HTTPStatus.OK:
+                entry.received = entry.received_etag = None
+                hit = False
+            else:
+                entry.received = received
+                entry.received_etag = etag
+                entry.current_date = current_date
+                hit = received == entry.content
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return hit
+
+    def current_date(self, headers):
+        """Вернет метку current_date последнего ответа с телом или None.
+        Нужна, чтобы продвинуть отметку опроса студента, ответ для
+        которого не изменился и поэтому не декодировался.
+        """
+        with self.lock:
+            entry = self.entries.get(headers['Authorization'])
+            return None if entry is None else entry.current_date
+
+    def commit(self, headers):
+        """Запомнит последний ответ как успешно обработанный."""
+        with self.lock:
+            entry = self.entries.get(headers['Authorization'])
+            if entry is not None:
+                entry.etag = entry.received_etag
+                entry.content = entry.received
+
+    def stats(self):
+        """Вернет счетчики попаданий и промахов."""
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+def fingerprint(content):
+    """Вернет отпечаток тела ответа без поля current_date."""
+    return hashlib.blake2b(
+        CURRENT_DATE.sub(b'', content), digest_size=16
+    ).digest()